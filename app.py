@@ -1,20 +1,32 @@
-from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi import FastAPI, HTTPException, Depends, Request, Query
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.responses import StreamingResponse, FileResponse, JSONResponse
 from sqlmodel import Session, select
 from pydantic import BaseModel
 import asyncio
 import os
-import json
+from typing import Optional
 
-from service import banking_service, AppStatus
+from service import AppStatus
+from jobstore import get_job_store, JobConflict
+from worker import SyncWorker
+from scheduler import SyncScheduler
+from live_view import LiveView
 from database import create_db_and_tables, get_session
 from models import User, Settings
-from routers import auth, settings
-from auth import get_current_user, decrypt_value
+from routers import auth, settings, runs, statements
+from auth import get_current_user, get_stream_user, shutdown_hash_pool
+from sync_config import build_sync_config
+from modules import serializer
+from modules.frames import FRAME_PROFILES, DEFAULT_FRAME_PROFILE
 
-app = FastAPI(title="Techcombank Sync")
+class SerializerJSONResponse(JSONResponse):
+    # Encode API responses with the configured serializer (orjson when available)
+    def render(self, content) -> bytes:
+        return serializer.dumps(content)
+
+app = FastAPI(title="Techcombank Sync", default_response_class=SerializerJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,22 +37,63 @@ app.add_middleware(
 
 app.include_router(auth.router)
 app.include_router(settings.router)
+app.include_router(runs.router)
+app.include_router(statements.router)
+
+# "embedded" runs a sync worker inside each API process, "external" expects
+# separate `python worker.py` processes so API workers stay stateless readers
+SYNC_WORKER_MODE = os.getenv("SYNC_WORKER_MODE", "embedded")
+job_store = get_job_store()
+# Shared by all /api/stream viewers of this process
+live_view = LiveView(job_store)
+# Periodic syncs for users with a sync interval, see scheduler.py
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+
+embedded_worker = None
+scheduler = None
 
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
+    global embedded_worker, scheduler
     create_db_and_tables()
+    if SYNC_WORKER_MODE == "embedded":
+        embedded_worker = SyncWorker(job_store)
+        app.state.worker_task = asyncio.create_task(embedded_worker.run_forever())
+    if SCHEDULER_ENABLED:
+        scheduler = SyncScheduler(job_store)
+        app.state.scheduler_task = asyncio.create_task(scheduler.run_forever())
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    if scheduler:
+        scheduler.stop()
+    if embedded_worker:
+        # Bounded: the running sync is stopped and its browser killed, see SyncWorker.shutdown
+        await embedded_worker.shutdown()
+        app.state.worker_task.cancel()
+    shutdown_hash_pool()
 
 class StatusResponse(BaseModel):
     status: AppStatus
     last_error: str
     logs: list[str]
+    run_id: Optional[str] = None
+    skipped_stages: list[str] = []
+    # Seconds from the stop request to the sync being idle, once it is
+    time_to_idle: Optional[float] = None
 
 @app.get("/api/status", response_model=StatusResponse)
 def get_status(current_user: User = Depends(get_current_user)):
+    job = job_store.latest_job(current_user.id)
+    if not job:
+        return StatusResponse(status=AppStatus.IDLE, last_error="", logs=[])
     return StatusResponse(
-        status=banking_service.status,
-        last_error=banking_service.last_error,
-        logs=banking_service.logs
+        status=job["status"],
+        last_error=job["last_error"],
+        logs=job_store.logs(job["id"]),
+        run_id=job["run_id"],
+        skipped_stages=job["skipped_stages"],
+        time_to_idle=job.get("time_to_idle"),
     )
 
 @app.post("/api/sync/start")
@@ -50,76 +103,51 @@ async def start_sync(
     session: Session = Depends(get_session)
 ):
     # Get optional date range from request body
-    body = await request.json() if request.headers.get("content-type") == "application/json" else {}
+    body = serializer.loads(await request.body()) if request.headers.get("content-type") == "application/json" else {}
     date_from = body.get("date_from")
     date_to = body.get("date_to")
+    # Resume the last failed run with the same inputs unless the client asks for a fresh one
+    resume = body.get("resume", True)
     # 1. Fetch user settings
     settings_db = session.exec(select(Settings).where(Settings.user_id == current_user.id)).first()
     if not settings_db:
         raise HTTPException(status_code=400, detail="Settings not configured. Please go to Settings page.")
 
     # 2. Decrypt credentials
-    # Handle both old (dict) and new (list) mapping formats
-    raw_mapping = json.loads(settings_db.accounts_mapping)
-    final_mapping = {}
-    
-    if isinstance(raw_mapping, list):
-        # New format: List of account objects with arrangementIds
-        for item in raw_mapping:
-            actual_account_id = item.get("id")
-            # Items might have 'arrangementIds' (new) or just be the object
-            # The user's example has "arrangementIds": ["..."]
-            arr_ids = item.get("arrangementIds", [])
-            for arr_id in arr_ids:
-                final_mapping[arr_id] = actual_account_id
-    else:
-        # Old format: Flat dict
-        final_mapping = raw_mapping
-
-    config = {
-        "tcb_username": settings_db.tcb_username,
-        "tcb_password": decrypt_value(settings_db.tcb_password_enc),
-        "actual_url": settings_db.actual_url,
-        "actual_password": decrypt_value(settings_db.actual_password_enc),
-        "actual_budget_id": settings_db.actual_budget_id,
-        "actual_budget_password": decrypt_value(settings_db.actual_budget_password_enc) if settings_db.actual_budget_password_enc else None,
-        "accounts_mapping": final_mapping,
-        "date_from": date_from,
-        "date_to": date_to
-    }
+    config = build_sync_config(settings_db, date_from, date_to)
+    if body.get("profile"):
+        # Profile this run, see /api/runs/{id}/profile
+        config["profile"] = True
 
     try:
-        await banking_service.start_sync(config)
-        return {"message": "Sync started"}
+        job_id = job_store.enqueue(current_user.id, config, resume=resume)
+        return {"message": "Sync started", "job_id": job_id}
+    except JobConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
-        if "already in progress" in str(e):
-             raise HTTPException(status_code=409, detail=str(e))
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/api/sync/stop")
 async def stop_sync(current_user: User = Depends(get_current_user)):
-    await banking_service.stop_sync()
+    job_store.request_cancel(current_user.id)
     return {"message": "Sync stopping..."}
 
-async def generate_mjpeg_stream():
-    # Stream for any authenticated user? Or should we restrict it?
-    # For now, simplistic stream. If we add token auth here, we need to pass token in URL.
-    # Since checking auth in streaming response is tricky with img tag, we might leave it open 
-    # OR require a token query param.
-    # For security, let's keep it open for now but acknowledge the risk (it's internal network).
-    while True:
-        screenshot = banking_service.get_latest_screenshot()
-        if screenshot:
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + screenshot + b'\r\n')
-        else:
-            pass
-        await asyncio.sleep(0.5)
+async def generate_mjpeg_stream(user_id: int, profile: str):
+    # Each part is closed with the next boundary right away, so browsers show it without
+    # waiting for the next frame, which only comes when the page changes.
+    yield b'--frame\r\n'
+    async for frame in live_view.frames(user_id, profile):
+        yield (b'Content-Type: image/jpeg\r\n'
+               b'Content-Length: ' + str(len(frame)).encode() + b'\r\n\r\n' + frame + b'\r\n--frame\r\n')
 
 @app.get("/api/stream")
-async def video_feed():
-    # Optionally: token = Query(...) and verify it.
-    return StreamingResponse(generate_mjpeg_stream(), media_type="multipart/x-mixed-replace; boundary=frame")
+async def video_feed(
+    profile: str = Query(DEFAULT_FRAME_PROFILE, pattern=f"^({'|'.join(FRAME_PROFILES)})$"),
+    current_user: User = Depends(get_stream_user),
+):
+    # Only the viewer's own sync, authenticated with ?token= since <img> can't send headers.
+    # profile: full (1920px), medium (960px) or thumb (480px) for small screens, see modules/frames.py
+    return StreamingResponse(generate_mjpeg_stream(current_user.id, profile), media_type="multipart/x-mixed-replace; boundary=frame")
 
 # Serve frontend static files
 # We assume the frontend is built to /app/frontend/dist
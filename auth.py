@@ -1,14 +1,19 @@
 import os
+import asyncio
+import time
+import multiprocessing as mp
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from sqlmodel import Session, select
 from cryptography.fernet import Fernet
 from database import get_session
 from models import User
+from modules import passwords
 
 # Configuration
 # Prefer env var, otherwise generate and ideally persist (skipped persistence for brevity, tokens invalidate on restart if random)
@@ -22,7 +27,7 @@ if not SECRET_KEY:
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60 # 30 days
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+pwd_context = passwords.get_context()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
 fernet = Fernet(SECRET_KEY.encode() if isinstance(SECRET_KEY, str) else SECRET_KEY)
 
@@ -34,6 +39,118 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+# --- Password hashing pool ---
+# argon2 is CPU and memory heavy on purpose. It runs in its own small process pool,
+# so a burst of logins cannot take over the threadpool the sync endpoints run in.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+# Hash/verify calls allowed in flight (running or queued in the pool), the rest wait
+PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", str(PASSWORD_HASH_WORKERS * 2)))
+# How long a request waits for a free slot before being rejected
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "5"))
+
+# Per-username throttling of failed logins
+LOGIN_MAX_FAILURES = int(os.getenv("LOGIN_MAX_FAILURES", "5"))
+LOGIN_FAILURE_WINDOW = float(os.getenv("LOGIN_FAILURE_WINDOW", "300")) # seconds
+# Usernames tracked at most, the least recently failed are forgotten first
+LOGIN_THROTTLE_MAX_USERNAMES = int(os.getenv("LOGIN_THROTTLE_MAX_USERNAMES", "10000"))
+
+_hash_pool: Optional[ProcessPoolExecutor] = None
+_hash_semaphore: Optional[asyncio.Semaphore] = None
+
+class PasswordHashBusy(Exception):
+    pass
+
+def _get_hash_pool() -> ProcessPoolExecutor:
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, mp_context=mp.get_context("spawn"))
+    return _hash_pool
+
+def shutdown_hash_pool():
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=False, cancel_futures=True)
+        _hash_pool = None
+
+async def _run_in_hash_pool(fn, *args):
+    global _hash_semaphore
+    if _hash_semaphore is None:
+        _hash_semaphore = asyncio.Semaphore(PASSWORD_HASH_CONCURRENCY)
+    try:
+        await asyncio.wait_for(_hash_semaphore.acquire(), timeout=PASSWORD_HASH_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise PasswordHashBusy("Too many concurrent authentication requests")
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_hash_pool(), fn, *args)
+    finally:
+        _hash_semaphore.release()
+
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    return await _run_in_hash_pool(passwords.verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password) -> str:
+    return await _run_in_hash_pool(passwords.hash_password, password)
+
+class LoginThrottle:
+    """Counts failed logins per username in a sliding window (per process).
+
+    Bounded in memory: expired usernames are swept once per window, and at most
+    max_usernames are tracked, so failures for random usernames can't pile up.
+    """
+
+    def __init__(
+        self,
+        max_failures: int = LOGIN_MAX_FAILURES,
+        window: float = LOGIN_FAILURE_WINDOW,
+        max_usernames: int = LOGIN_THROTTLE_MAX_USERNAMES,
+    ):
+        self.max_failures = max_failures
+        self.window = window
+        self.max_usernames = max_usernames
+        self._failures: OrderedDict[str, deque] = OrderedDict() # Least recently failed first
+        self._next_sweep = time.monotonic() + window
+
+    def _prune(self, username: str, now: float):
+        failures = self._failures.get(username)
+        if failures is None:
+            return
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[username]
+
+    def _sweep(self, now: float):
+        # In failure order, so everything after the first username still in its window is too
+        for username, failures in list(self._failures.items()):
+            if failures[-1] > now - self.window:
+                break
+            del self._failures[username]
+        self._next_sweep = now + self.window
+
+    def retry_after(self, username: str) -> float:
+        """Seconds until the username may try again, 0 if it is not throttled."""
+        now = time.monotonic()
+        self._prune(username, now)
+        failures = self._failures.get(username)
+        if not failures or len(failures) < self.max_failures:
+            return 0
+        return failures[0] + self.window - now
+
+    def record_failure(self, username: str):
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._sweep(now)
+        failures = self._failures.pop(username, None) or deque(maxlen=self.max_failures)
+        failures.append(now)
+        self._failures[username] = failures
+        while len(self._failures) > self.max_usernames:
+            self._failures.popitem(last=False)
+
+    def reset(self, username: str):
+        self._failures.pop(username, None)
+
+login_throttle = LoginThrottle()
+
 # --- Encryption Utils ---
 def encrypt_value(value: str) -> str:
     if not value: return ""
@@ -57,7 +174,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)):
+def _user_from_token(token: str, session: Session) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -75,3 +192,10 @@ async def get_current_user(token: str = Depends(oauth2_scheme), session: Session
     if user is None:
         raise credentials_exception
     return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)):
+    return _user_from_token(token, session)
+
+async def get_stream_user(token: str = Query(...), session: Session = Depends(get_session)):
+    # <img> tags can't send an Authorization header, the stream takes the token in the URL
+    return _user_from_token(token, session)
@@ -0,0 +1,70 @@
+"""Decode + convert cost of the typed transaction path against plain dicts.
+
+    python -m benchmarks.bench_convert [--count 100000]
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from benchmarks.sample_data import make_transactions, make_mapping
+from modules import convert, transactions
+
+
+def _dict_path(body: bytes, mapping: dict) -> dict:
+    # What the pipeline did before: generic dicts and a new output dict per row
+    converted = {}
+    for t in json.loads(body):
+        account_id = mapping.get(t["arrangementId"])
+        if not account_id:
+            continue
+        amount = float(t["transactionAmountCurrency"]["amount"])
+        out = {
+            "imported_id": t["id"],
+            "date": t["bookingDate"],
+            "amount": int(amount) * 100,
+            "payee_name": t.get("counterPartyName"),
+            "notes": t["description"].removeprefix("Giao dich thanh toan/Purchase - So The/Card No:"),
+            "account": account_id,
+        }
+        if t["creditDebitIndicator"] == "DBIT":
+            out["amount"] = -out["amount"]
+        if "counterPartyAccountNumber" in t:
+            out["notes"] += f" @ {t['counterPartyAccountNumber']}"
+        converted.setdefault(account_id, []).append(out)
+    return converted
+
+
+def _typed_path(body: bytes, mapping: dict) -> dict:
+    return convert.convert_to_actual_import(transactions.decode_bank_body(body), mapping)
+
+
+def _measure(fn, body, mapping):
+    start = time.perf_counter()
+    fn(body, mapping)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    result = fn(body, mapping)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=100_000)
+    args = parser.parse_args()
+
+    body = json.dumps(make_transactions(args.count)).encode()
+    mapping = make_mapping()
+    print(f"{args.count} transactions, {len(body) / 1024 / 1024:.1f} MiB body\n")
+    print(f"{'path':<8} {'time (s)':>9} {'peak memory (MiB)':>18}")
+    for name, fn in (("dicts", _dict_path), ("typed", _typed_path)):
+        elapsed, peak = _measure(fn, body, mapping)
+        print(f"{name:<8} {elapsed:>9.3f} {peak / 1024 / 1024:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Logins per second through the argon2 process pool, at the configured ARGON2_* parameters.
+
+    python -m benchmarks.bench_login [--logins 40] [--concurrency 16]
+
+Compare PASSWORD_HASH_WORKERS / ARGON2_* settings, e.g.
+    ARGON2_MEMORY_COST=32768 PASSWORD_HASH_WORKERS=4 python -m benchmarks.bench_login
+"""
+import argparse
+import asyncio
+import time
+
+import auth
+from modules import passwords
+
+
+async def _bench(logins: int, concurrency: int, hashed: str):
+    # Warm up the pool processes so their start-up is not measured
+    await asyncio.gather(*[auth.verify_password_async("password", hashed) for _ in range(auth.PASSWORD_HASH_WORKERS)])
+
+    latencies = []
+    rejected = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login():
+        nonlocal rejected
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                assert await auth.verify_password_async("password", hashed)
+            except auth.PasswordHashBusy:
+                rejected += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[login() for _ in range(logins)])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f"pool: {len(latencies) / elapsed:.1f} logins/s, p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, "
+          f"max {latencies[-1] * 1000:.0f} ms, rejected {rejected}")
+
+    # Meanwhile the event loop stays free, check how long a trivial task waits during a burst
+    lags = []
+
+    async def probe(stop_at):
+        while time.perf_counter() < stop_at:
+            t = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lags.append(time.perf_counter() - t - 0.01)
+
+    burst = asyncio.gather(*[login() for _ in range(logins)])
+    await asyncio.gather(burst, probe(time.perf_counter() + elapsed))
+    print(f"event loop lag during burst: max {max(lags) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=16, help="simultaneous login requests")
+    args = parser.parse_args()
+
+    print(f"argon2 time_cost={passwords.ARGON2_TIME_COST} memory_cost={passwords.ARGON2_MEMORY_COST}KiB "
+          f"parallelism={passwords.ARGON2_PARALLELISM}, pool workers={auth.PASSWORD_HASH_WORKERS} "
+          f"concurrency limit={auth.PASSWORD_HASH_CONCURRENCY}")
+    hashed = passwords.hash_password("password")
+
+    start = time.perf_counter()
+    for _ in range(5):
+        passwords.verify_password("password", hashed)
+    print(f"single verify in-process: {(time.perf_counter() - start) / 5 * 1000:.0f} ms")
+
+    try:
+        asyncio.run(_bench(args.logins, args.concurrency, hashed))
+    finally:
+        auth.shutdown_hash_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Conversion time with growing rule sets: compiled matcher against checking rules one by one.
+
+    python -m benchmarks.bench_rules [--count 100000] [--rules 10 100 1000]
+"""
+import argparse
+import json
+import random
+import re
+import string
+import time
+
+from benchmarks.sample_data import make_transactions, make_mapping
+from modules import convert, rules, transactions
+
+
+def make_rules(count: int, seed: int = 7) -> list[dict]:
+    # Mostly keyword rules like real categorization, a few regex renames and prefix strips
+    rng = random.Random(seed)
+    words = ["grab", "shopee", "evn", "salary", "nguyen van a"]
+    out = []
+    for i in range(count):
+        keyword = words[i] if i < len(words) else "".join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 12)))
+        kind = i % 10
+        if kind < 6:
+            out.append({"type": "payee", "keyword": keyword, "payee": keyword.title()})
+        elif kind < 9:
+            out.append({"type": "category", "keyword": keyword, "category": f"category-{i}"})
+        elif i % 20 == 9:
+            out.append({"type": "rename", "field": "notes", "pattern": rf"\b{keyword}\b", "replace": keyword.upper()})
+        else:
+            out.append({"type": "strip_prefix", "value": keyword.upper() + " "})
+    return out
+
+
+class NaiveRules:
+    """Every rule checked against every transaction, what a straightforward loop would do.
+
+    Same semantics as rules.CompiledRules: the longest matching prefix is stripped, the first
+    matching payee and category rules win, then every matching rename is applied in order.
+    """
+
+    def __init__(self, rule_list: list[dict]):
+        self.rules = rules.DEFAULT_RULES + rule_list
+        self.patterns = {i: re.compile(r["pattern"]) for i, r in enumerate(self.rules) if r["type"] == "rename"}
+
+    def apply(self, description, payee):
+        notes, category = description, None
+        prefixes = [r["value"] for r in self.rules if r["type"] == "strip_prefix" and description.startswith(r["value"])]
+        if prefixes:
+            notes = notes[len(max(prefixes, key=len)):]
+        text = f"{description}\n{payee or ''}".lower()
+        payee_set = category_set = False
+        for rule in self.rules:
+            if rule["type"] == "payee" and not payee_set and rule["keyword"].lower() in text:
+                payee, payee_set = rule["payee"], True
+            elif rule["type"] == "category" and not category_set and rule["keyword"].lower() in text:
+                category, category_set = rule["category"], True
+        for i, rule in enumerate(self.rules):
+            if rule["type"] != "rename":
+                continue
+            if rule["field"] == "payee" and payee:
+                payee = self.patterns[i].sub(rule["replace"], payee, count=1)
+            elif rule["field"] == "notes" and notes:
+                notes = self.patterns[i].sub(rule["replace"], notes, count=1)
+        return notes, payee, category
+
+
+def _time(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--rules", type=int, nargs="+", default=[0, 10, 100, 1000])
+    args = parser.parse_args()
+
+    decoded = transactions.decode_bank_body(json.dumps(make_transactions(args.count)).encode())
+    mapping = make_mapping()
+    print(f"{args.count} transactions\n")
+    print(f"{'rules':>6} {'compile (ms)':>13} {'compiled (s)':>13} {'one by one (s)':>15} {'same output':>12}")
+    for count in args.rules:
+        rule_list = make_rules(count)
+        compile_time = _time(lambda: rules.compile_rules(rule_list))
+        compiled = rules.compile_rules(rule_list)
+        results = {}
+        fast = _time(lambda: results.update(fast=convert.convert_to_actual_import(decoded, mapping, compiled)))
+        slow = _time(lambda: results.update(slow=convert.convert_to_actual_import(decoded, mapping, NaiveRules(rule_list))))
+        same = results["fast"] == results["slow"]
+        print(f"{count:>6} {compile_time * 1000:>13.1f} {fast:>13.3f} {slow:>15.3f} {str(same):>12}")
+
+
+if __name__ == "__main__":
+    main()
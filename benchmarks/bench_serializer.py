@@ -0,0 +1,39 @@
+"""Compare the available serializers on realistic transaction bodies.
+
+    python -m benchmarks.bench_serializer [--count 500] [--repeat 200]
+"""
+import argparse
+import json
+import timeit
+
+from modules.serializer import SERIALIZERS
+from benchmarks.sample_data import make_transactions, make_mapping
+from modules.convert import convert_to_actual_import
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=500, help="transactions per body (the fetch page size)")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    transactions = make_transactions(args.count)
+    bank_body = json.dumps(transactions).encode()
+    actual_payload = {"_": ["actual-account-0", list(convert_to_actual_import(transactions, make_mapping()).values())[0]]}
+    print(f"bank body: {len(bank_body)} bytes, {args.count} transactions, {args.repeat} runs\n")
+
+    print(f"{'serializer':<10} {'parse bank (ms)':>16} {'encode actual (ms)':>19} {'encode status (ms)':>19}")
+    status = {"status": "saving_data", "last_error": "", "logs": ["12:00:00 - Converting 500 transactions..."] * 50}
+    baseline = None
+    for name, s in SERIALIZERS.items():
+        parse = timeit.timeit(lambda: s.loads(bank_body), number=args.repeat) / args.repeat * 1000
+        encode = timeit.timeit(lambda: s.dumps(actual_payload), number=args.repeat) / args.repeat * 1000
+        status_ms = timeit.timeit(lambda: s.dumps(status), number=args.repeat * 10) / (args.repeat * 10) * 1000
+        if name == "stdlib":
+            baseline = parse + encode
+        speedup = f"  x{baseline / (parse + encode):.1f}" if baseline else ""
+        print(f"{name:<10} {parse:>16.3f} {encode:>19.3f} {status_ms:>19.4f}{speedup}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""Load test for the HTTP API and the live view stream.
+
+Starts the app in a child process with an in-memory fake job store (a sync that is
+always running and producing logs and frames, no browser), then drives a mix of clients:
+
+    python -m benchmarks.loadtest --status 50 --settings 5 --auth 2 --stream 10 --duration 30
+
+Use --url to target an already running instance instead (it must accept --username/--password).
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+import urllib.parse
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# --- Fake backend ---
+
+def _fake_frame() -> bytes:
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        # Only the full size profile can be streamed without Pillow, it doesn't decode frames
+        return b"\xff\xd8" + os.urandom(120 * 1024) + b"\xff\xd9"
+    # Something like a banking page: flat background, boxes and text-like noise
+    image = Image.new("RGB", (1920, 1080), (245, 246, 248))
+    draw = ImageDraw.Draw(image)
+    for i in range(40):
+        draw.rectangle((100 + i % 4 * 440, 120 + i // 4 * 90, 500 + i % 4 * 440, 190 + i // 4 * 90), outline=(200, 30, 40))
+        draw.text((120 + i % 4 * 440, 140 + i // 4 * 90), f"Giao dich {i} 1.250.000 VND " * 2, fill=(20, 20, 20))
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=50)
+    return out.getvalue()
+
+
+def _make_fake_store_class():
+    from jobstore import JobStore, JobConflict
+
+    class FakeJobStore(JobStore):
+        """Every user always has one running job with a full log buffer and a frame."""
+
+        def __init__(self):
+            self._frame = _fake_frame()
+            self._logs = [f"12:00:{i:02d} - Fetching data..." for i in range(50)]
+
+        def enqueue(self, user_id, config, resume=True):
+            raise JobConflict("Sync already in progress")
+
+        def request_cancel(self, user_id):
+            return True
+
+        def latest_job(self, user_id):
+            return {
+                "id": user_id, "user_id": user_id, "state": "running", "status": "fetching_data",
+                "last_error": "", "run_id": "loadtest", "skipped_stages": [], "cancel_requested": False,
+                "created_at": datetime.utcnow(), "updated_at": datetime.utcnow(),
+            }
+
+        def logs(self, job_id, limit=50):
+            return self._logs[-limit:]
+
+        def watch(self, user_id, seconds):
+            pass
+
+        def latest_frame(self, user_id, newer_than=None):
+            # A new frame twice a second, like a page in use
+            now = datetime.now(timezone.utc)
+            version = now.replace(microsecond=now.microsecond // 500000 * 500000)
+            if newer_than is not None and version <= newer_than:
+                return None
+            return version, self._frame
+
+    return FakeJobStore
+
+
+def _serve(port: int, workdir: str):
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+    os.environ.setdefault("SECRET_KEY", "bG9hZHRlc3QtbG9hZHRlc3QtbG9hZHRlc3QtbG9hZHQ=")
+    os.environ["SYNC_WORKER_MODE"] = "external"
+    os.environ["JOB_STORE_BACKEND"] = "fake"
+    os.environ["SCHEDULER_ENABLED"] = "false"
+
+    import jobstore
+    jobstore.JOB_STORE_BACKENDS["fake"] = _make_fake_store_class()
+
+    import uvicorn
+    from app import app
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+# --- Minimal keep-alive HTTP/1.1 client ---
+
+class HttpClient:
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def _connect(self):
+        if self._writer is None or self._writer.is_closing():
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+    async def _read_head(self):
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            key, _, value = line.decode().partition(":")
+            headers[key.strip().lower()] = value.strip()
+        return status, headers
+
+    async def _send(self, method: str, path: str, headers: dict, body: bytes):
+        await self._connect()
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(body)}\r\n"
+        head += "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+        self._writer.write(head.encode() + b"\r\n" + body)
+        await self._writer.drain()
+
+    async def request(self, method: str, path: str, headers: dict = None, body: bytes = b""):
+        await self._send(method, path, headers or {}, body)
+        status, resp_headers = await self._read_head()
+        if "content-length" in resp_headers:
+            data = await self._reader.readexactly(int(resp_headers["content-length"]))
+        elif resp_headers.get("transfer-encoding") == "chunked":
+            data = b""
+            while True:
+                size = int((await self._reader.readline()).strip(), 16)
+                chunk = await self._reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                data += chunk[:-2]
+        else:
+            data = await self._reader.read()
+            self.close()
+        return status, data
+
+    async def stream(self, path: str, on_chunk, stop_at: float):
+        """Read a chunked streaming response until stop_at, calling on_chunk(size) per chunk."""
+        await self._send("GET", path, {}, b"")
+        await self._read_head()
+        while time.monotonic() < stop_at:
+            size = int((await self._reader.readline()).strip(), 16)
+            await self._reader.readexactly(size + 2)
+            if size == 0:
+                break
+            on_chunk(size)
+        self.close()
+
+    def close(self):
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+
+
+# --- Scenarios ---
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.stream_bytes = 0
+        self.stream_chunks = 0
+
+    def report(self, duration: float):
+        print(f"\n{'scenario':<10} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for name, values in sorted(self.latencies.items()):
+            values.sort()
+            pct = lambda p: values[min(len(values) - 1, int(len(values) * p))] * 1000
+            print(f"{name:<10} {len(values):>9} {self.errors[name]:>7} {len(values) / duration:>9.1f} "
+                  f"{pct(0.50):>9.2f} {pct(0.95):>9.2f} {pct(0.99):>9.2f}")
+        if self.stream_chunks:
+            print(f"\nstream: {self.stream_chunks / duration:.1f} chunks/s, {self.stream_bytes / duration / 1024:.1f} KiB/s total")
+
+
+async def _timed(stats: Stats, name: str, coro):
+    start = time.perf_counter()
+    try:
+        status, _ = await coro
+        if status >= 400:
+            stats.errors[name] += 1
+    except Exception:
+        stats.errors[name] += 1
+        return
+    stats.latencies[name].append(time.perf_counter() - start)
+
+
+async def _poller(client: HttpClient, stats: Stats, name: str, method: str, path: str, headers: dict, body: bytes, stop_at: float, interval: float):
+    while time.monotonic() < stop_at:
+        await _timed(stats, name, client.request(method, path, headers, body))
+        if interval:
+            await asyncio.sleep(interval)
+    client.close()
+
+
+async def _streamer(client: HttpClient, stats: Stats, stop_at: float, profile: str, token: str):
+    def on_chunk(size):
+        stats.stream_bytes += size
+        stats.stream_chunks += 1
+    try:
+        await client.stream(f"/api/stream?profile={profile}&token={token}", on_chunk, stop_at)
+    except Exception:
+        stats.errors["stream"] += 1
+
+
+def _rss_kib(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+
+async def _sample_memory(pid: Optional[int], stop_at: float, samples: list):
+    while pid and time.monotonic() < stop_at:
+        rss = _rss_kib(pid)
+        if rss:
+            samples.append(rss)
+        await asyncio.sleep(0.5)
+
+
+async def _wait_ready(host: str, port: int, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            client = HttpClient(host, port)
+            await client.request("GET", "/docs")
+            client.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def run(args, server_pid: Optional[int]):
+    url = urllib.parse.urlparse(args.url)
+    host, port = url.hostname, url.port or 80
+    await _wait_ready(host, port)
+
+    setup = HttpClient(host, port)
+    creds = urllib.parse.urlencode({"username": args.username, "password": args.password}).encode()
+    form = {"Content-Type": "application/x-www-form-urlencoded"}
+    await setup.request("POST", "/api/auth/register", {"Content-Type": "application/json"},
+                        f'{{"username": "{args.username}", "password": "{args.password}"}}'.encode())
+    status, body = await setup.request("POST", "/api/auth/token", form, creds)
+    if status != 200:
+        raise RuntimeError(f"login failed: {status} {body!r}")
+    token = json.loads(body)["access_token"]
+    auth = {"Authorization": f"Bearer {token}"}
+    setup.close()
+
+    stats = Stats()
+    memory = []
+    stop_at = time.monotonic() + args.duration
+    tasks = [asyncio.create_task(_sample_memory(server_pid, stop_at, memory))]
+    for _ in range(args.status):
+        tasks.append(_poller(HttpClient(host, port), stats, "status", "GET", "/api/status", auth, b"", stop_at, args.interval))
+    for _ in range(args.settings):
+        tasks.append(_poller(HttpClient(host, port), stats, "settings", "GET", "/api/settings/", auth, b"", stop_at, args.interval))
+    for _ in range(args.auth):
+        tasks.append(_poller(HttpClient(host, port), stats, "auth", "POST", "/api/auth/token", form, creds, stop_at, 0))
+    for _ in range(args.stream):
+        tasks.append(_streamer(HttpClient(host, port), stats, stop_at, args.stream_profile, token))
+
+    started = time.monotonic()
+    await asyncio.gather(*tasks)
+    stats.report(time.monotonic() - started)
+    if memory:
+        print(f"server RSS: start {memory[0] / 1024:.1f} MiB, peak {max(memory) / 1024:.1f} MiB, "
+              f"mean {statistics.mean(memory) / 1024:.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="target an existing instance instead of starting one")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--status", type=int, default=20, help="concurrent /api/status pollers")
+    parser.add_argument("--settings", type=int, default=2, help="concurrent /api/settings/ readers")
+    parser.add_argument("--auth", type=int, default=1, help="concurrent /api/auth/token clients")
+    parser.add_argument("--stream", type=int, default=5, help="concurrent /api/stream subscribers")
+    parser.add_argument("--stream-profile", default="full", help="live view profile of the subscribers: full, medium or thumb")
+    parser.add_argument("--interval", type=float, default=0.0, help="pause between requests of a poller (the dashboard uses 1s)")
+    parser.add_argument("--username", default="loadtest")
+    parser.add_argument("--password", default="loadtest-password")
+    args = parser.parse_args()
+
+    server = None
+    if not args.url:
+        args.url = f"http://127.0.0.1:{args.port}"
+        workdir = tempfile.mkdtemp(prefix="tcb-loadtest-")
+        # Not a daemon: the server starts its own password hashing processes
+        server = mp.get_context("spawn").Process(target=_serve, args=(args.port, workdir))
+        server.start()
+    try:
+        asyncio.run(run(args, server.pid if server else None))
+    finally:
+        if server:
+            server.terminate()
+            server.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import random
+import uuid
+from datetime import date, timedelta
+
+# Shaped like the transaction-manager API response, including fields the converter does not use
+_DESCRIPTIONS = [
+    "Giao dich thanh toan/Purchase - So The/Card No: 4xxx xxxx xxxx 1234 GRAB*FOOD HCMC",
+    "CHUYEN TIEN DEN TAI KHOAN NGUYEN VAN A",
+    "Thanh toan hoa don dien thang 10",
+    "Giao dich thanh toan/Purchase - So The/Card No: 4xxx xxxx xxxx 5678 SHOPEE PAY",
+    "Luong thang 10 - Salary October",
+]
+_PAYEES = ["GRAB", "SHOPEE", "EVN HCMC", "NGUYEN VAN A", None]
+
+
+def make_transaction(arrangement_id: str, day: date) -> dict:
+    amount = random.choice([random.randint(10, 5000) * 1000, round(random.uniform(1, 500), 2)])
+    tx = {
+        "id": uuid.uuid4().hex,
+        "arrangementId": arrangement_id,
+        "externalArrangementId": arrangement_id.upper(),
+        "reference": f"FT{random.randint(10**9, 10**10)}",
+        "description": random.choice(_DESCRIPTIONS),
+        "typeGroup": "Payment",
+        "type": "Card",
+        "category": "Uncategorised",
+        "bookingDate": day.isoformat(),
+        "valueDate": day.isoformat(),
+        "creditDebitIndicator": random.choice(["DBIT", "DBIT", "DBIT", "CRDT"]),
+        "transactionAmountCurrency": {"amount": str(amount), "currencyCode": "VND"},
+        "instructedAmountCurrency": {"amount": str(amount), "currencyCode": "VND"},
+        "runningBalance": str(random.randint(10**6, 10**9)),
+        "billingStatus": "BILLED",
+        "additions": {"creditBank": "TCB", "debitAcctName": "NGUYEN VAN B", "channel": "MOBILE"},
+    }
+    payee = random.choice(_PAYEES)
+    if payee:
+        tx["counterPartyName"] = payee
+        tx["counterPartyAccountNumber"] = str(random.randint(10**9, 10**12))
+    return tx
+
+
+def make_transactions(count: int, arrangements: int = 3, seed: int = 42) -> list[dict]:
+    random.seed(seed)
+    arrangement_ids = [f"arr-{i}" for i in range(arrangements)]
+    start = date.today()
+    return [make_transaction(random.choice(arrangement_ids), start - timedelta(days=i % 365)) for i in range(count)]
+
+
+def make_mapping(arrangements: int = 3) -> dict:
+    return {f"arr-{i}": f"actual-account-{i}" for i in range(arrangements)}
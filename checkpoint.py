@@ -0,0 +1,99 @@
+import json
+import os
+import uuid
+from datetime import timedelta
+from typing import Optional
+from sqlalchemy import delete, func
+from sqlmodel import Session, select
+
+from database import engine
+from auth import encrypt_value, decrypt_value
+from modules import serializer
+from modules.stages import STAGE_FETCH, STAGE_ACTUAL_TOKEN, STAGE_DONE
+from models import SyncCheckpoint, utcnow
+from modules.logger import logger
+
+# Stage payloads holding credentials or raw bank data, encrypted at rest
+SECRET_STAGES = {STAGE_FETCH, STAGE_ACTUAL_TOKEN}
+# Checkpoints of runs untouched for this long are deleted, finished or not
+CHECKPOINT_RETENTION_DAYS = float(os.getenv("CHECKPOINT_RETENTION_DAYS", "7"))
+
+
+class CheckpointStore:
+    """Durable per-run stage outputs, so a failed sync can resume where it stopped.
+
+    modules.stages.MemoryCheckpointStore has the same interface for runs without a database.
+    """
+
+    def new_run_id(self) -> str:
+        return uuid.uuid4().hex
+
+    def find_resumable(self, user_id: Optional[int], fingerprint: str) -> Optional[str]:
+        # Latest run with the same inputs that has checkpoints but never reached "done"
+        with Session(engine) as session:
+            last = session.exec(
+                select(SyncCheckpoint)
+                .where(SyncCheckpoint.user_id == user_id, SyncCheckpoint.fingerprint == fingerprint)
+                .order_by(SyncCheckpoint.id.desc())
+            ).first()
+            if not last or last.stage == STAGE_DONE:
+                return None
+            return last.run_id
+
+    def load(self, run_id: str) -> dict:
+        with Session(engine) as session:
+            rows = session.exec(
+                select(SyncCheckpoint).where(SyncCheckpoint.run_id == run_id).order_by(SyncCheckpoint.id)
+            ).all()
+            stages = {row.stage: json.loads(row.data) for row in rows}
+        for stage in SECRET_STAGES & stages.keys():
+            value = decrypt_value(stages.pop(stage))
+            # Written with another SECRET_KEY or before the stage was encrypted, redo the stage
+            if value:
+                stages[stage] = value
+        return stages
+
+    def save(self, run_id: str, user_id: Optional[int], fingerprint: str, stage: str, data=None):
+        if stage in SECRET_STAGES:
+            data = encrypt_value(data)
+        with Session(engine) as session:
+            session.add(SyncCheckpoint(
+                run_id=run_id,
+                user_id=user_id,
+                fingerprint=fingerprint,
+                stage=stage,
+                data=serializer.dumps(data).decode(),
+            ))
+            session.commit()
+
+    def prune(self):
+        cutoff = utcnow() - timedelta(days=CHECKPOINT_RETENTION_DAYS)
+        stale = (
+            select(SyncCheckpoint.run_id)
+            .group_by(SyncCheckpoint.run_id)
+            .having(func.max(SyncCheckpoint.created_at) < cutoff)
+        )
+        with Session(engine) as session:
+            result = session.exec(delete(SyncCheckpoint).where(SyncCheckpoint.run_id.in_(stale)))
+            session.commit()
+        if result.rowcount:
+            logger.info(f"Deleted {result.rowcount} checkpoints older than {CHECKPOINT_RETENTION_DAYS:g} days")
+
+    def discard(self, run_id: str, stage: str):
+        with Session(engine) as session:
+            for row in session.exec(
+                select(SyncCheckpoint).where(SyncCheckpoint.run_id == run_id, SyncCheckpoint.stage == stage)
+            ).all():
+                session.delete(row)
+            session.commit()
+
+    def complete(self, run_id: str, user_id: Optional[int], fingerprint: str):
+        # Stage payloads (raw bank bodies, tokens) are no longer needed once the run is done
+        with Session(engine) as session:
+            for row in session.exec(select(SyncCheckpoint).where(SyncCheckpoint.run_id == run_id)).all():
+                session.delete(row)
+            session.commit()
+        self.save(run_id, user_id, fingerprint, STAGE_DONE)
+
+
+checkpoint_store = CheckpointStore()
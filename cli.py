@@ -0,0 +1,197 @@
+"""Run one sync from the environment, without the web app, the database or the live view.
+
+    python -m cli [--date-from 2024-10-01 --date-to 2024-10-31] [--dry-run]
+                  [--replay body.json] [--save-body body.json]
+                  [--rules rules.json] [--export ndjson,csv,parquet]
+    python -m cli --statement statement.xlsx --account <arrangement or Actual account id> [--dry-run]
+
+Credentials come from TCB_USERNAME, TCB_PASSWORD, ACTUAL_URL, ACTUAL_PASSWORD,
+ACTUAL_BUDGET_ID, ACTUAL_BUDGET_PASSWORD and TCB_ACCOUNTS_MAPPING (see modules/config.py).
+--statement imports a downloaded CSV/XLSX statement instead, no browser involved.
+A JSON summary is printed to stdout, logs go to stderr. Exits with 0 on success,
+1 when the sync failed and 2 on bad arguments or configuration.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from modules import config, serializer
+from modules.convert import parse_accounts_mapping
+from modules.logger import logger
+from modules.rules import RuleError, validate_rules
+from modules.sinks import SINKS
+from modules.statements import StatementError, import_statement
+from modules.stages import MemoryCheckpointStore, STAGE_FETCH
+from service import AppStatus, BankingService
+
+
+class _RecordingCheckpointStore(MemoryCheckpointStore):
+    """Also writes the fetched bank response to a file, for a later --replay."""
+
+    def __init__(self, body_path: str, initial_stages=None):
+        super().__init__(initial_stages)
+        self.body_path = body_path
+
+    def save(self, run_id, user_id, fingerprint, stage, data=None):
+        super().save(run_id, user_id, fingerprint, stage, data)
+        if stage == STAGE_FETCH:
+            with open(self.body_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            logger.info(f"Saved bank response to {self.body_path}")
+
+
+def _fail(message: str) -> int:
+    print(serializer.dumps({"status": AppStatus.ERROR.value, "last_error": message}).decode())
+    return 2
+
+
+def build_config(args) -> dict:
+    (
+        arrangements,
+        actual_url,
+        actual_password,
+        actual_budget_id,
+        actual_budget_password,
+        tcb_username,
+        tcb_password,
+    ) = config.get_config()
+
+    missing = []
+    if not (args.replay or args.statement) and not (tcb_username and tcb_password):
+        missing += ["TCB_USERNAME", "TCB_PASSWORD"]
+    if not args.dry_run and not (actual_url and actual_password and actual_budget_id):
+        missing += ["ACTUAL_URL", "ACTUAL_PASSWORD", "ACTUAL_BUDGET_ID"]
+    if missing:
+        raise ValueError(f"Missing environment variables: {', '.join(missing)}")
+
+    accounts_mapping = parse_accounts_mapping(arrangements)
+    if not accounts_mapping:
+        raise ValueError("TCB_ACCOUNTS_MAPPING is empty, no transaction would be imported")
+
+    rules = []
+    if args.rules:
+        with open(args.rules, encoding="utf-8") as f:
+            rules = validate_rules(json.load(f))
+
+    export_sinks = [name for name in (args.export or "").split(",") if name]
+    unknown = set(export_sinks) - set(SINKS)
+    if unknown:
+        raise ValueError(f"Unknown export sinks: {', '.join(sorted(unknown))}")
+
+    return {
+        "user_id": None,
+        "tcb_username": tcb_username,
+        "tcb_password": tcb_password,
+        "actual_url": actual_url,
+        "actual_password": actual_password,
+        "actual_budget_id": actual_budget_id,
+        "actual_budget_password": actual_budget_password,
+        "accounts_mapping": accounts_mapping,
+        "export_sinks": export_sinks,
+        "rules": rules,
+        "date_from": args.date_from,
+        "date_to": args.date_to,
+        "dry_run": args.dry_run,
+    }
+
+
+async def run(sync_config: dict, checkpoints: MemoryCheckpointStore) -> BankingService:
+    # No on_frame hook, so no screenshot loop
+    service = BankingService(checkpoints=checkpoints)
+    await service.start_sync(sync_config, resume=False)
+    try:
+        await service.wait()
+    except asyncio.CancelledError:
+        # Ctrl-C, close the browser before exiting
+        await service.stop_sync()
+        raise
+    return service
+
+
+def run_statement(args, sync_config: dict) -> int:
+    started = time.perf_counter()
+    try:
+        with open(args.statement, "rb") as f:
+            stats = import_statement(f, sync_config, args.account, currency=args.currency).to_dict()
+    except (StatementError, OSError) as e:
+        return _fail(str(e))
+    except KeyboardInterrupt:
+        return 130
+    except Exception as e:
+        logger.error(f"Statement import failed: {e}")
+        print(serializer.dumps({"status": AppStatus.ERROR.value, "last_error": str(e)}).decode())
+        return 1
+    print(serializer.dumps({
+        "status": AppStatus.SUCCESS.value,
+        "dry_run": args.dry_run,
+        "statement": args.statement,
+        "duration_seconds": round(time.perf_counter() - started, 3),
+        "transactions": sum(stats["account_counts"].values()),
+        **stats,
+    }).decode())
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m cli", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--date-from", help="YYYY-MM-DD, defaults to 30 days ago")
+    parser.add_argument("--date-to", help="YYYY-MM-DD, defaults to today")
+    parser.add_argument("--dry-run", action="store_true", help="convert (and export) but don't import to Actual")
+    parser.add_argument("--replay", metavar="FILE", help="use a saved bank response instead of logging in")
+    parser.add_argument("--save-body", metavar="FILE", help="save the fetched bank response for --replay")
+    parser.add_argument("--rules", metavar="FILE", help="JSON list of payee/category rules")
+    parser.add_argument("--export", metavar="SINKS", help="comma separated export sinks: " + ", ".join(SINKS))
+    parser.add_argument("--statement", metavar="FILE", help="import a downloaded CSV/XLSX statement")
+    parser.add_argument("--account", help="arrangement id or Actual account id of the --statement")
+    parser.add_argument("--currency", default="VND", help="currency of the --statement when it has no currency column")
+    args = parser.parse_args(argv)
+
+    if bool(args.date_from) != bool(args.date_to):
+        return _fail("--date-from and --date-to go together")
+    try:
+        sync_config = build_config(args)
+    except (ValueError, RuleError, OSError) as e:
+        return _fail(str(e))
+
+    if args.statement:
+        if not args.account:
+            return _fail("--statement needs --account")
+        return run_statement(args, sync_config)
+
+    initial_stages = {}
+    if args.replay:
+        try:
+            with open(args.replay, encoding="utf-8") as f:
+                initial_stages[STAGE_FETCH] = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            return _fail(f"Could not read --replay file: {e}")
+    if args.save_body:
+        checkpoints = _RecordingCheckpointStore(args.save_body, initial_stages)
+    else:
+        checkpoints = MemoryCheckpointStore(initial_stages)
+
+    started = time.perf_counter()
+    try:
+        service = asyncio.run(run(sync_config, checkpoints))
+    except KeyboardInterrupt:
+        return 130
+
+    stats = service.run_stats()
+    summary = {
+        **service.snapshot(),
+        "dry_run": args.dry_run,
+        "replay": bool(args.replay),
+        "date_from": sync_config["date_from"],
+        "date_to": sync_config["date_to"],
+        "duration_seconds": round(time.perf_counter() - started, 3),
+        "transactions": sum(stats["account_counts"].values()),
+        **stats,
+    }
+    print(serializer.dumps(summary).decode())
+    return 0 if service.status == AppStatus.SUCCESS else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,7 @@
 from sqlmodel import SQLModel, create_engine, Session
+from sqlalchemy import event, inspect, text
+from sqlalchemy.exc import IntegrityError
+from modules.logger import logger
 
 import os
 
@@ -13,8 +16,53 @@ sqlite_url = f"sqlite:///{sqlite_file_name}"
 connect_args = {"check_same_thread": False}
 engine = create_engine(sqlite_url, echo=False, connect_args=connect_args)
 
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # API and worker processes share this file, WAL lets readers run alongside the writer
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+def _add_missing_columns():
+    # create_all does not touch existing tables, add columns introduced since the table was created.
+    # New columns must be nullable or have a server default.
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                col_type = column.type.compile(dialect=engine.dialect)
+                default = ""
+                if column.server_default is not None:
+                    arg = column.server_default.arg
+                    default = f" DEFAULT {arg.text}" if hasattr(arg, "text") else f" DEFAULT '{arg}'"
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {col_type}{default}'))
+
+def _add_missing_indexes():
+    # Same for indexes added to an existing table
+    inspector = inspect(engine)
+    for table in SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {i["name"] for i in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            try:
+                index.create(engine)
+            except IntegrityError as e:
+                # Rows that break a new unique index, it is tried again on the next start
+                logger.error(f"Could not create index {index.name}: {e.orig}")
+
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    _add_missing_columns()
+    _add_missing_indexes()
 
 def get_session():
     with Session(engine) as session:
@@ -10,7 +10,7 @@ function DashboardPage() {
     const [status, setStatus] = useState('idle')
     const [lastError, setLastError] = useState('')
     const [logs, setLogs] = useState([])
-    const { logout, user } = useAuth()
+    const { logout, user, token } = useAuth()
     const navigate = useNavigate()
 
     // Date range state (default to last 30 days)
@@ -60,6 +60,28 @@ function DashboardPage() {
         }
     }
 
+    const [statementFile, setStatementFile] = useState(null)
+    const [statementAccount, setStatementAccount] = useState('')
+    const [importing, setImporting] = useState(false)
+    const [importResult, setImportResult] = useState('')
+
+    const handleImportStatement = async () => {
+        // Older periods from a downloaded CSV/XLSX statement, no browser involved
+        const form = new FormData()
+        form.append('file', statementFile)
+        form.append('account', statementAccount)
+        setImporting(true)
+        setImportResult('')
+        try {
+            const res = await axios.post('/api/statements/import', form)
+            setImportResult(`Imported ${res.data.transactions} transactions, ${res.data.imported} new in Actual`)
+        } catch (e) {
+            alert("Failed to import statement: " + (e.response?.data?.detail || e.message))
+        } finally {
+            setImporting(false)
+        }
+    }
+
     const handleStop = async () => {
         try {
             await axios.post('/api/sync/stop')
@@ -89,6 +111,9 @@ function DashboardPage() {
     }
 
     const isRunning = status !== 'idle' && status !== 'error' && status !== 'success'
+    // The live view box is at most 800px wide, no need for full size frames on most screens
+    const streamWidth = Math.min(window.innerWidth, 800) * (window.devicePixelRatio || 1)
+    const streamProfile = streamWidth <= 480 ? 'thumb' : streamWidth <= 960 ? 'medium' : 'full'
     const isWaitingOtp = status === 'waiting_otp'
 
     return (
@@ -163,7 +188,7 @@ function DashboardPage() {
                                 )}
                                 <div style={{ border: '2px solid var(--glass-border)', borderRadius: '16px', overflow: 'hidden', height: '400px', width: '100%', background: '#000', margin: '0 auto', boxShadow: '0 10px 30px rgba(0,0,0,0.5)' }}>
                                     <img
-                                        src="/api/stream"
+                                        src={`/api/stream?profile=${streamProfile}&token=${encodeURIComponent(token)}`}
                                         style={{ width: '100%', height: '100%', objectFit: 'contain' }}
                                         alt="Browser Stream"
                                     />
@@ -184,6 +209,31 @@ function DashboardPage() {
                     </div>
                 )}
             </div>
+
+            <div className="glass-card" style={{ maxWidth: '800px', margin: '2rem auto 0' }}>
+                <h3 style={{ fontSize: '1.2rem', color: 'var(--text-muted)', marginBottom: '1rem' }}>Import Statement File</h3>
+                <div style={{ display: 'flex', gap: '1rem', alignItems: 'center', flexWrap: 'wrap' }}>
+                    <input
+                        type="file"
+                        accept=".csv,.xlsx"
+                        onChange={(e) => setStatementFile(e.target.files[0] || null)}
+                        disabled={importing}
+                    />
+                    <input
+                        type="text"
+                        className="input-modern"
+                        style={{ width: 'auto', flex: 1 }}
+                        placeholder="Arrangement ID or Actual account ID"
+                        value={statementAccount}
+                        onChange={(e) => setStatementAccount(e.target.value)}
+                        disabled={importing}
+                    />
+                    <button onClick={handleImportStatement} disabled={importing || !statementFile || !statementAccount}>
+                        {importing ? 'Importing...' : 'Import'}
+                    </button>
+                </div>
+                {importResult && <div style={{ marginTop: '1rem', color: 'var(--success)' }}>{importResult}</div>}
+            </div>
         </div>
     )
 }
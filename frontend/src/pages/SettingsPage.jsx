@@ -12,7 +12,11 @@ export default function SettingsPage() {
         actual_budget_id: '',
         actual_budget_password: '',
         // Mappings will be parsed into this array
-        mappings: []
+        mappings: [],
+        export_sinks: [],
+        sync_interval_minutes: 0,
+        // Edited as JSON text, parsed on save
+        rules_text: '[]'
     });
     const [msg, setMsg] = useState('');
     const fileInputRef = useRef(null);
@@ -44,7 +48,8 @@ export default function SettingsPage() {
 
                 setFormData({
                     ...data,
-                    mappings: parsedMappings
+                    mappings: parsedMappings,
+                    rules_text: JSON.stringify(data.rules || [], null, 2)
                 });
             } catch (e) {
                 console.error(e);
@@ -68,6 +73,14 @@ export default function SettingsPage() {
         setFormData({ ...formData, mappings: newMappings });
     };
 
+    const toggleSink = (sink) => {
+        const sinks = formData.export_sinks || [];
+        setFormData({
+            ...formData,
+            export_sinks: sinks.includes(sink) ? sinks.filter(s => s !== sink) : [...sinks, sink]
+        });
+    };
+
     const addMapping = () => {
         setFormData({
             ...formData,
@@ -122,11 +135,19 @@ export default function SettingsPage() {
 
     const handleSubmit = async (e) => {
         e.preventDefault();
+        let rules;
+        try {
+            rules = JSON.parse(formData.rules_text || '[]');
+        } catch (err) {
+            setMsg('Error parsing rules: ' + err.message);
+            return;
+        }
         try {
             // Prepare payload: convert mappings array back to JSON string for storage
             const payload = {
                 ...formData,
-                accounts_mapping: JSON.stringify(formData.mappings)
+                accounts_mapping: JSON.stringify(formData.mappings),
+                rules
             };
             // Remove temporary mappings field from payload to match schema if necessary
             // But our schema in frontend is just constructing the object. 
@@ -273,6 +294,56 @@ export default function SettingsPage() {
                         )}
                     </div>
 
+                    <h3 style={{ color: 'var(--text-muted)', fontSize: '0.85rem', textTransform: 'uppercase', letterSpacing: '1px', marginTop: '3rem', display: 'flex', alignItems: 'center', gap: '0.5rem' }}>
+                        <span style={{ width: '8px', height: '8px', background: 'var(--warning)', borderRadius: '2px' }}></span>
+                        Exports
+                    </h3>
+                    <div style={{ display: 'flex', gap: '1.5rem', flexWrap: 'wrap' }}>
+                        {['ndjson', 'csv', 'parquet'].map(sink => (
+                            <label key={sink} style={{ display: 'flex', alignItems: 'center', gap: '0.5rem', textTransform: 'uppercase', fontSize: '0.85rem' }}>
+                                <input
+                                    type="checkbox"
+                                    checked={(formData.export_sinks || []).includes(sink)}
+                                    onChange={() => toggleSink(sink)}
+                                />
+                                {sink}
+                            </label>
+                        ))}
+                    </div>
+
+                    <h3 style={{ color: 'var(--text-muted)', fontSize: '0.85rem', textTransform: 'uppercase', letterSpacing: '1px', marginTop: '3rem', display: 'flex', alignItems: 'center', gap: '0.5rem' }}>
+                        <span style={{ width: '8px', height: '8px', background: 'var(--primary)', borderRadius: '2px' }}></span>
+                        Rules
+                    </h3>
+                    <p style={{ color: 'var(--text-muted)', fontSize: '0.8rem', marginBottom: '0.75rem' }}>
+                        JSON list. Prefixes are stripped first, the first matching payee and category rules win, then every matching rename is applied in order. Types: strip_prefix, payee, category, rename (see LOCAL_DEV.md).
+                    </p>
+                    <textarea
+                        name="rules_text"
+                        rows={8}
+                        spellCheck={false}
+                        style={{ width: '100%', fontFamily: 'monospace', fontSize: '0.85rem' }}
+                        value={formData.rules_text}
+                        onChange={handleChange}
+                        placeholder='[{"type": "payee", "keyword": "grab", "payee": "Grab"}]'
+                    />
+
+                    <h3 style={{ color: 'var(--text-muted)', fontSize: '0.85rem', textTransform: 'uppercase', letterSpacing: '1px', marginTop: '3rem', display: 'flex', alignItems: 'center', gap: '0.5rem' }}>
+                        <span style={{ width: '8px', height: '8px', background: 'var(--success)', borderRadius: '2px' }}></span>
+                        Schedule
+                    </h3>
+                    <label style={{ display: 'flex', alignItems: 'center', gap: '0.75rem', fontSize: '0.9rem' }}>
+                        Sync every
+                        <input
+                            type="number"
+                            min="0"
+                            style={{ width: '6rem' }}
+                            value={formData.sync_interval_minutes || 0}
+                            onChange={e => setFormData({ ...formData, sync_interval_minutes: parseInt(e.target.value, 10) || 0 })}
+                        />
+                        minutes (0 = off)
+                    </label>
+
                     {msg && (
                         <div style={{
                             marginTop: '2rem',
@@ -0,0 +1,301 @@
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import update, delete, or_, and_
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select, func
+
+from database import engine
+from models import SyncJob, SyncLog, SyncFrame, utcnow
+from auth import encrypt_value, decrypt_value
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_FINISHED = "finished"
+
+MAX_LOG_LINES = 50
+
+
+class JobConflict(Exception):
+    pass
+
+
+class JobStore:
+    """Shared store for sync jobs, their status, logs and live view frames.
+
+    API processes only enqueue jobs and read state, workers claim jobs with a lease
+    and report progress back, so any number of either can run side by side.
+    """
+
+    def enqueue(self, user_id: int, config: dict, resume: bool = True) -> int:
+        raise NotImplementedError
+
+    def claim(self, worker_id: str, lease_seconds: float) -> Optional[dict]:
+        """Claim the oldest queued job (or one whose lease expired). Returns the job with its config."""
+        raise NotImplementedError
+
+    def renew(self, job_id: int, worker_id: str, lease_seconds: float) -> bool:
+        """Extend the lease. False means the lease was lost and the job must be abandoned."""
+        raise NotImplementedError
+
+    def update(self, job_id: int, worker_id: str, **fields):
+        raise NotImplementedError
+
+    def finish(self, job_id: int, worker_id: str, **fields):
+        raise NotImplementedError
+
+    def request_cancel(self, user_id: int) -> bool:
+        raise NotImplementedError
+
+    def is_cancel_requested(self, job_id: int) -> bool:
+        raise NotImplementedError
+
+    def append_logs(self, job_id: int, messages: list[str]):
+        raise NotImplementedError
+
+    def latest_job(self, user_id: int) -> Optional[dict]:
+        raise NotImplementedError
+
+    def active_count(self) -> int:
+        """Jobs queued or running, across all users."""
+        raise NotImplementedError
+
+    def logs(self, job_id: int, limit: int = MAX_LOG_LINES) -> list[str]:
+        raise NotImplementedError
+
+    def watch(self, user_id: int, seconds: float):
+        """Someone watches the live view of the user's sync for the next `seconds`."""
+        raise NotImplementedError
+
+    def is_watched(self, job_id: int) -> bool:
+        raise NotImplementedError
+
+    def put_frame(self, job_id: int, data: bytes):
+        raise NotImplementedError
+
+    def latest_frame(self, user_id: int, newer_than: Optional[datetime] = None) -> Optional[tuple[datetime, bytes]]:
+        """(updated_at, jpeg) of the frame of the user's running job, None if there is none newer than `newer_than`."""
+        raise NotImplementedError
+
+
+def _aware(value: datetime) -> datetime:
+    # SQLite hands timestamps back without their timezone
+    return value if value.tzinfo else value.replace(tzinfo=utcnow().tzinfo)
+
+
+def _job_view(job: SyncJob) -> dict:
+    return {
+        "id": job.id,
+        "user_id": job.user_id,
+        "state": job.state,
+        "status": job.status,
+        "last_error": job.last_error,
+        "run_id": job.run_id,
+        "skipped_stages": json.loads(job.skipped_stages or "[]"),
+        "cancel_requested": job.cancel_requested,
+        "time_to_idle": job.time_to_idle,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+    }
+
+
+class SQLiteJobStore(JobStore):
+    def __init__(self, engine=engine):
+        self._engine = engine
+
+    def enqueue(self, user_id: int, config: dict, resume: bool = True) -> int:
+        with Session(self._engine) as session:
+            active = session.exec(
+                select(SyncJob).where(SyncJob.user_id == user_id, SyncJob.state != JOB_FINISHED)
+            ).first()
+            if active:
+                raise JobConflict("Sync already in progress")
+            # Another process may enqueue between the check and the insert, the unique index
+            # on unfinished jobs (see SyncJob) turns that into a conflict too
+
+            # Only the logs of the latest job are shown, drop older ones
+            old_ids = select(SyncJob.id).where(SyncJob.user_id == user_id)
+            session.exec(delete(SyncLog).where(SyncLog.job_id.in_(old_ids)))
+            session.exec(delete(SyncFrame).where(SyncFrame.job_id.in_(old_ids)))
+
+            job = SyncJob(
+                user_id=user_id,
+                config_enc=encrypt_value(json.dumps(config)),
+                resume=resume,
+                status="starting",
+            )
+            session.add(job)
+            try:
+                session.commit()
+            except IntegrityError:
+                session.rollback()
+                raise JobConflict("Sync already in progress")
+            session.refresh(job)
+            return job.id
+
+    def claim(self, worker_id: str, lease_seconds: float) -> Optional[dict]:
+        now = utcnow()
+        claimable = or_(
+            SyncJob.state == JOB_QUEUED,
+            and_(SyncJob.state == JOB_RUNNING, SyncJob.lease_expires_at < now),
+        )
+        with Session(self._engine) as session:
+            candidate = session.exec(select(SyncJob).where(claimable).order_by(SyncJob.id)).first()
+            if not candidate:
+                return None
+            # Compare-and-set, another worker may have claimed it in the meantime
+            result = session.exec(
+                update(SyncJob)
+                .where(SyncJob.id == candidate.id, claimable)
+                .values(
+                    state=JOB_RUNNING,
+                    lease_owner=worker_id,
+                    lease_expires_at=now + timedelta(seconds=lease_seconds),
+                    updated_at=now,
+                )
+            )
+            session.commit()
+            if result.rowcount != 1:
+                return None
+            session.refresh(candidate)
+            job = _job_view(candidate)
+            job["resume"] = candidate.resume
+            job["config"] = json.loads(decrypt_value(candidate.config_enc) or "{}")
+            return job
+
+    def renew(self, job_id: int, worker_id: str, lease_seconds: float) -> bool:
+        now = utcnow()
+        with Session(self._engine) as session:
+            result = session.exec(
+                update(SyncJob)
+                .where(SyncJob.id == job_id, SyncJob.lease_owner == worker_id, SyncJob.state == JOB_RUNNING)
+                .values(lease_expires_at=now + timedelta(seconds=lease_seconds))
+            )
+            session.commit()
+            return result.rowcount == 1
+
+    def _write(self, job_id: int, worker_id: str, fields: dict):
+        if "skipped_stages" in fields:
+            fields["skipped_stages"] = json.dumps(fields["skipped_stages"])
+        fields["updated_at"] = utcnow()
+        with Session(self._engine) as session:
+            session.exec(
+                update(SyncJob)
+                .where(SyncJob.id == job_id, SyncJob.lease_owner == worker_id)
+                .values(**fields)
+            )
+            session.commit()
+
+    def update(self, job_id: int, worker_id: str, **fields):
+        self._write(job_id, worker_id, fields)
+
+    def finish(self, job_id: int, worker_id: str, **fields):
+        fields.update(state=JOB_FINISHED, lease_expires_at=None, config_enc="")
+        with Session(self._engine) as session:
+            requested_at = session.exec(select(SyncJob.cancel_requested_at).where(SyncJob.id == job_id)).first()
+        if requested_at:
+            fields["time_to_idle"] = round((utcnow() - _aware(requested_at)).total_seconds(), 3)
+        self._write(job_id, worker_id, fields)
+
+    def request_cancel(self, user_id: int) -> bool:
+        with Session(self._engine) as session:
+            job = session.exec(
+                select(SyncJob).where(SyncJob.user_id == user_id, SyncJob.state != JOB_FINISHED)
+            ).first()
+            if not job:
+                return False
+            if job.state == JOB_QUEUED:
+                # Nobody picked it up yet, finish it right away
+                job.state = JOB_FINISHED
+                job.status = "idle"
+                job.config_enc = ""
+                job.time_to_idle = 0.0
+            elif not job.cancel_requested:
+                job.cancel_requested = True
+                job.cancel_requested_at = utcnow()
+            job.updated_at = utcnow()
+            session.add(job)
+            session.commit()
+            return True
+
+    def is_cancel_requested(self, job_id: int) -> bool:
+        with Session(self._engine) as session:
+            job = session.get(SyncJob, job_id)
+            return bool(job and job.cancel_requested)
+
+    def append_logs(self, job_id: int, messages: list[str]):
+        with Session(self._engine) as session:
+            session.add_all(SyncLog(job_id=job_id, message=message) for message in messages)
+            session.commit()
+
+    def latest_job(self, user_id: int) -> Optional[dict]:
+        with Session(self._engine) as session:
+            job = session.exec(
+                select(SyncJob).where(SyncJob.user_id == user_id).order_by(SyncJob.id.desc())
+            ).first()
+            return _job_view(job) if job else None
+
+    def active_count(self) -> int:
+        with Session(self._engine) as session:
+            return session.exec(select(func.count()).select_from(SyncJob).where(SyncJob.state != JOB_FINISHED)).one()
+
+    def logs(self, job_id: int, limit: int = MAX_LOG_LINES) -> list[str]:
+        with Session(self._engine) as session:
+            rows = session.exec(
+                select(SyncLog.message).where(SyncLog.job_id == job_id).order_by(SyncLog.id.desc()).limit(limit)
+            ).all()
+            return list(reversed(rows))
+
+    def watch(self, user_id: int, seconds: float):
+        with Session(self._engine) as session:
+            session.exec(
+                update(SyncJob)
+                .where(SyncJob.user_id == user_id, SyncJob.state != JOB_FINISHED)
+                .values(watched_until=utcnow() + timedelta(seconds=seconds))
+            )
+            session.commit()
+
+    def is_watched(self, job_id: int) -> bool:
+        with Session(self._engine) as session:
+            watched_until = session.exec(select(SyncJob.watched_until).where(SyncJob.id == job_id)).first()
+            return bool(watched_until and _aware(watched_until) > utcnow())
+
+    def put_frame(self, job_id: int, data: bytes):
+        with Session(self._engine) as session:
+            frame = session.get(SyncFrame, job_id) or SyncFrame(job_id=job_id, data=data)
+            frame.data = data
+            frame.updated_at = utcnow()
+            session.add(frame)
+            session.commit()
+
+    def latest_frame(self, user_id: int, newer_than: Optional[datetime] = None) -> Optional[tuple[datetime, bytes]]:
+        with Session(self._engine) as session:
+            # Check the timestamp first, the blob is only read when there is a new frame
+            latest = session.exec(
+                select(SyncFrame.job_id, SyncFrame.updated_at)
+                .join(SyncJob, SyncJob.id == SyncFrame.job_id)
+                .where(SyncJob.user_id == user_id, SyncJob.state == JOB_RUNNING)
+            ).first()
+            if not latest or (newer_than is not None and latest.updated_at <= newer_than):
+                return None
+            data = session.exec(select(SyncFrame.data).where(SyncFrame.job_id == latest.job_id)).first()
+            return (latest.updated_at, data) if data else None
+
+
+# Backends by name, other deployments can register their own (e.g. Redis or Postgres)
+JOB_STORE_BACKENDS = {
+    "sqlite": SQLiteJobStore,
+}
+
+_job_store: Optional[JobStore] = None
+
+
+def get_job_store() -> JobStore:
+    global _job_store
+    if _job_store is None:
+        backend = os.getenv("JOB_STORE_BACKEND", "sqlite")
+        if backend not in JOB_STORE_BACKENDS:
+            raise ValueError(f"Unknown JOB_STORE_BACKEND: {backend}")
+        _job_store = JOB_STORE_BACKENDS[backend]()
+    return _job_store
@@ -0,0 +1,101 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import AsyncIterator, Dict, Optional
+
+from jobstore import JobStore
+from modules.frames import encode_frame
+from modules.logger import logger
+
+# How often one API process checks the job store for a new frame, per watched user
+FRAME_POLL_INTERVAL = float(os.getenv("FRAME_POLL_INTERVAL", "0.25"))
+# A still page is resent this often so proxies don't drop the idle stream
+FRAME_KEEPALIVE_SECONDS = float(os.getenv("FRAME_KEEPALIVE_SECONDS", "10"))
+# Workers store frames until this long after the last viewer's poller was seen, see JobStore.watch
+FRAME_WATCH_SECONDS = float(os.getenv("FRAME_WATCH_SECONDS", "5"))
+
+
+class _Channel:
+    """The live view of one user's sync, shared by all of that user's viewers."""
+
+    def __init__(self):
+        self.version: Optional[datetime] = None
+        self.frame: Optional[bytes] = None
+        self.encoded: Dict[str, asyncio.Future] = {}
+        self.new_frame = asyncio.Event()
+        self.viewers = 0
+        self.poller: Optional[asyncio.Task] = None
+
+
+class LiveView:
+    """Fans the live view out to all /api/stream viewers of this process.
+
+    Each user only sees their own sync. One poller per watched user reads new frames
+    from the job store, and tells the worker someone is watching so it stores them. Each frame is encoded at most once per profile, on the first
+    viewer that needs it, and shared with every other viewer of that profile.
+    """
+
+    def __init__(self, store: JobStore):
+        self.store = store
+        self._channels: Dict[int, _Channel] = {}
+
+    @property
+    def viewers(self) -> int:
+        return sum(channel.viewers for channel in self._channels.values())
+
+    async def _poll(self, user_id: int, channel: _Channel):
+        loop = asyncio.get_running_loop()
+        watched_at = None
+        while channel.viewers:
+            try:
+                if watched_at is None or time.monotonic() - watched_at >= FRAME_WATCH_SECONDS / 2:
+                    await loop.run_in_executor(None, self.store.watch, user_id, FRAME_WATCH_SECONDS)
+                    watched_at = time.monotonic()
+                latest = await loop.run_in_executor(None, self.store.latest_frame, user_id, channel.version)
+                if latest:
+                    channel.version, channel.frame = latest
+                    channel.encoded = {}
+                    # Wake everyone up, then arm the event for the next frame
+                    channel.new_frame.set()
+                    channel.new_frame = asyncio.Event()
+            except Exception as e:
+                logger.debug(f"Failed to read live view frame: {e}")
+            await asyncio.sleep(FRAME_POLL_INTERVAL)
+        # Nobody watching, don't show a stale frame to the next viewer
+        if self._channels.get(user_id) is channel:
+            del self._channels[user_id]
+
+    def _encode(self, channel: _Channel, profile: str) -> asyncio.Future:
+        encoded = channel.encoded.get(profile)
+        if encoded is None:
+            # Pillow releases the GIL while coding, keep it off the event loop
+            encoded = channel.encoded[profile] = asyncio.get_running_loop().run_in_executor(
+                None, encode_frame, channel.frame, profile
+            )
+        return encoded
+
+    async def frames(self, user_id: int, profile: str) -> AsyncIterator[bytes]:
+        """JPEG frames of the user's sync for one viewer: every new frame, and the current one again after a quiet period."""
+        channel = self._channels.get(user_id)
+        if channel is None:
+            # The poller drops the channel as soon as the last viewer left
+            channel = self._channels[user_id] = _Channel()
+            channel.poller = asyncio.create_task(self._poll(user_id, channel))
+        channel.viewers += 1
+        try:
+            sent = None
+            while True:
+                if channel.frame is not None and channel.version != sent:
+                    sent = channel.version
+                    try:
+                        yield await self._encode(channel, profile)
+                    except Exception as e:
+                        logger.warning(f"Failed to encode live view frame for '{profile}': {e}")
+                    continue
+                try:
+                    await asyncio.wait_for(channel.new_frame.wait(), FRAME_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    sent = None
+        finally:
+            channel.viewers -= 1
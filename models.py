@@ -1,6 +1,11 @@
 from typing import Optional
+from datetime import datetime, timezone
+from sqlalchemy import Index, text
 from sqlmodel import Field, SQLModel
 
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     username: str = Field(index=True, unique=True)
@@ -22,3 +27,109 @@ class Settings(SQLModel, table=True):
     
     # Mappings (JSON string)
     accounts_mapping: str = "{}"
+
+    # Extra export sinks run alongside the Actual import (JSON list, e.g. ["ndjson", "parquet"])
+    export_sinks: str = Field(default="[]", sa_column_kwargs={"server_default": "[]"})
+
+    # Payee/notes/category rules (JSON list, see modules/rules.py)
+    rules: str = Field(default="[]", sa_column_kwargs={"server_default": "[]"})
+
+    # Scheduled syncs, 0 disables them
+    sync_interval_minutes: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    next_sync_at: Optional[datetime] = None
+    # Newest transaction id seen by the last successful sync
+    sync_watermark: Optional[str] = None
+
+    # Profile the next sync run, cleared once a profile was stored
+    profile_next_run: bool = Field(default=False, sa_column_kwargs={"server_default": "0"})
+
+class SyncCheckpoint(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    run_id: str = Field(index=True)
+    user_id: Optional[int] = Field(default=None, index=True)
+    # Hash of the inputs of the run, a retry only resumes a run with the same inputs
+    fingerprint: str = Field(index=True)
+    stage: str
+    data: str = "" # JSON payload of the stage output
+    created_at: datetime = Field(default_factory=utcnow)
+
+class SyncJob(SQLModel, table=True):
+    # At most one unfinished job per user, enforced by the database so concurrent
+    # enqueues from several API processes can't both get in
+    __table_args__ = (
+        Index("ux_syncjob_active_user", "user_id", unique=True, sqlite_where=text("state != 'finished'")),
+    )
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    config_enc: str # Encrypted JSON config, it contains credentials
+    resume: bool = True
+
+    # queued -> running -> finished
+    state: str = Field(default="queued", index=True)
+    status: str = "idle" # AppStatus reported by the worker
+    last_error: str = ""
+    run_id: Optional[str] = None
+    skipped_stages: str = "[]" # JSON list
+    cancel_requested: bool = False
+    cancel_requested_at: Optional[datetime] = None
+    time_to_idle: Optional[float] = None # Seconds from the stop request until the job finished
+    # Renewed by API processes while someone has the live view open, frames are only stored until then
+    watched_until: Optional[datetime] = None
+
+    # Lease held by the worker running the job, an expired lease can be claimed again
+    lease_owner: Optional[str] = None
+    lease_expires_at: Optional[datetime] = Field(default=None, index=True)
+
+    created_at: datetime = Field(default_factory=utcnow)
+    updated_at: datetime = Field(default_factory=utcnow)
+
+class SyncLog(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    job_id: int = Field(foreign_key="syncjob.id", index=True)
+    message: str
+    created_at: datetime = Field(default_factory=utcnow)
+
+class SyncFrame(SQLModel, table=True):
+    # Latest live view screenshot of a running job
+    job_id: int = Field(foreign_key="syncjob.id", primary_key=True)
+    data: bytes
+    updated_at: datetime = Field(default_factory=utcnow, index=True)
+
+class BankToken(SQLModel, table=True):
+    # Cached transaction API bearer token, lets a sync skip the browser while it is valid
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id", unique=True)
+    token_enc: str # Encrypted
+    expires_at: datetime
+    updated_at: datetime = Field(default_factory=utcnow)
+
+class SyncRun(SQLModel, table=True):
+    # One row per finished sync job, kept for history and statistics
+    __table_args__ = (Index("ix_syncrun_user_started", "user_id", "started_at"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id")
+    job_id: Optional[int] = None
+    run_id: Optional[str] = None
+    status: str # Final AppStatus
+    error_class: Optional[str] = None # Exception type name of a failed run
+    attempts: int = 1
+
+    started_at: datetime = Field(index=True)
+    finished_at: datetime
+    duration_seconds: float
+    phases: str = "{}" # JSON, seconds spent per phase (login, fetch, convert, export, import)
+
+    bytes_fetched: int = 0
+    transactions: int = 0
+    account_counts: str = "{}" # JSON, transactions per Actual account
+    imported: int = 0 # Added to Actual
+    skipped: int = 0 # Already in Actual or skipped from a checkpoint
+    profiled: bool = Field(default=False, sa_column_kwargs={"server_default": "0"})
+
+class SyncProfile(SQLModel, table=True):
+    # Profile of a run, kept out of syncrun so history queries don't load it
+    run_id: int = Field(foreign_key="syncrun.id", primary_key=True)
+    pstats: bytes # Same format as pstats.Stats.dump_stats
+    tasks: str = "[]" # JSON, asyncio tasks with start offset, duration and final state
+    created_at: datetime = Field(default_factory=utcnow)
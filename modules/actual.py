@@ -1,6 +1,10 @@
+import os
 import urllib.request
-import json
 
+from .serializer import dumps, loads
+
+# A blocked call would also block the sync's exit (executor threads are joined), so never wait forever
+ACTUAL_TIMEOUT = float(os.getenv("ACTUAL_TIMEOUT", "120"))
 
 
 
@@ -15,7 +19,7 @@ def init_actual(config: dict):
     }
 
     # Convert body to JSON string
-    body_json = json.dumps(body).encode("utf-8")
+    body_json = dumps(body)
 
     # Create request object
     req = urllib.request.Request(
@@ -27,19 +31,16 @@ def init_actual(config: dict):
 
     # Send the request and read the response
     try:
-        with urllib.request.urlopen(req) as response:
-            # Read and decode the response
-            response_body = response.read().decode("utf-8")
-
-            # Parse the JSON response
-            res = json.loads(response_body)
+        with urllib.request.urlopen(req, timeout=ACTUAL_TIMEOUT) as response:
+            # Read and parse the JSON response
+            res = loads(response.read())
 
             # Return the token
             return res["token"]
 
 
 
-    except urllib.error.URLError as e:
+    except (urllib.error.URLError, TimeoutError) as e:
         # Handle any network-related errors
         from .logger import logger
         logger.error(f"Error occurred: {e}")
@@ -53,7 +54,7 @@ def import_transactions(token, account_id, transactions, actual_url):
     body = {"_": [account_id, transactions]}
 
     # Convert body to JSON string
-    body_json = json.dumps(body).encode("utf-8")
+    body_json = dumps(body)
 
     # Create request object
     req = urllib.request.Request(
@@ -69,14 +70,11 @@ def import_transactions(token, account_id, transactions, actual_url):
 
     # Send the request and read the response
     try:
-        with urllib.request.urlopen(req) as response:
-            # Read and decode the response
-            response_body = response.read().decode("utf-8")
-
-            # Parse the JSON response
-            return json.loads(response_body)
+        with urllib.request.urlopen(req, timeout=ACTUAL_TIMEOUT) as response:
+            # Read and parse the JSON response
+            return loads(response.read())
 
-    except urllib.error.URLError as e:
+    except (urllib.error.URLError, TimeoutError) as e:
         # Handle any network-related errors
 
         from .logger import logger
@@ -1,67 +1,92 @@
 import json
 from pprint import pprint
-from typing import List, Dict
-from fastnumbers import try_real
-from itertools import groupby
-from operator import itemgetter
-from functools import reduce
+from typing import Dict, Iterable, List, Optional, Union
 
 from .exchange_rate import get_exchange_rate
-
-
-
-def convert_to_actual_transaction(transaction: Dict, mapping: Dict):
+from .rules import CompiledRules, DEFAULT_COMPILED_RULES
+from .transactions import ActualTransaction, BankTransaction
+
+
+
+def parse_accounts_mapping(accounts_mapping: Union[str, Dict, List]) -> Dict:
+    # Handle both old (dict) and new (list) mapping formats, as a JSON string or already decoded
+    raw_mapping = json.loads(accounts_mapping) if isinstance(accounts_mapping, str) else accounts_mapping
+    final_mapping = {}
+    
+    if isinstance(raw_mapping, list):
+        # New format: List of account objects with arrangementIds
+        for item in raw_mapping:
+            actual_account_id = item.get("id")
+            # Items might have 'arrangementIds' (new) or just be the object
+            # The user's example has "arrangementIds": ["..."]
+            arr_ids = item.get("arrangementIds", [])
+            for arr_id in arr_ids:
+                final_mapping[arr_id] = actual_account_id
+    else:
+        # Old format: Flat dict
+        final_mapping = raw_mapping
+    return final_mapping
+
+
+def convert_to_actual_transaction(
+    transaction: Union[BankTransaction, Dict],
+    mapping: Dict,
+    rates: Optional[Dict] = None,
+    rules: CompiledRules = DEFAULT_COMPILED_RULES,
+):
     if not mapping:
         return None
 
+    if isinstance(transaction, dict):
+        transaction = BankTransaction.from_dict(transaction)
+
     # Find account ID from arrangement ID
     # mapping is {arrangementId: accountId}
-    account_id = mapping.get(transaction["arrangementId"])
+    account_id = mapping.get(transaction.arrangement_id)
 
     if not account_id:
         return
 
-    amount = try_real(transaction["transactionAmountCurrency"]["amount"])
-    currency = transaction["transactionAmountCurrency"]["currencyCode"]
-
-    out = {
-        "imported_id": transaction["id"],
-        "date": transaction["bookingDate"],
-        "amount": int(amount) * 100,
-        "payee_name": transaction.get("counterPartyName"),
-        "notes": transaction["description"].removeprefix(
-            "Giao dich thanh toan/Purchase - So The/Card No:"
-        ),
-        "account": account_id,
-    }
-
-    if currency != "VND":
-        exchange_rate = get_exchange_rate(currency)
-        out["amount"] = round(amount * exchange_rate * 100)
-
-    out["amount"] = (
-        -out["amount"]
-        if transaction["creditDebitIndicator"] == "DBIT"
-        else out["amount"]
+    money = transaction.transaction_amount_currency
+
+    if money.currency_code == "VND":
+        amount = money.minor_units
+    else:
+        # Rates are looked up once per currency and batch
+        if rates is None:
+            rates = {}
+        if money.currency_code not in rates:
+            rates[money.currency_code] = get_exchange_rate(money.currency_code)
+        amount = round(float(money.amount) * rates[money.currency_code] * 100)
+
+    # Prefix strip, payee mapping, categories and renames, all in one pass (modules/rules.py)
+    notes, payee_name, category = rules.apply(transaction.description, transaction.counter_party_name)
+    if transaction.counter_party_account_number is not None:
+        notes += f" @ {transaction.counter_party_account_number}"
+
+    return ActualTransaction(
+        imported_id=transaction.id,
+        date=transaction.booking_date,
+        amount=-amount if transaction.is_debit else amount,
+        payee_name=payee_name,
+        notes=notes,
+        account=account_id,
+        category=category,
     )
 
-    if "counterPartyAccountNumber" in transaction:
-        out["notes"] += f" @ {transaction['counterPartyAccountNumber']}"
-
-    return out
-
-
-def convert_to_actual_import(transactions: List[Dict], mapping: Dict):
-    # Pass mapping to inner function
-    a = list(filter(lambda x: x, [convert_to_actual_transaction(t, mapping) for t in transactions]))
-    if not a:
-        return {}
-        
-    a = sorted(a, key=itemgetter("account"))
 
-    converted = {
-        key: list(group) for key, group in groupby(a, key=itemgetter("account"))
-    }
+def convert_to_actual_import(
+    transactions: Iterable[Union[BankTransaction, Dict]],
+    mapping: Dict,
+    rules: CompiledRules = DEFAULT_COMPILED_RULES,
+) -> Dict[str, List[ActualTransaction]]:
+    # Group by account in one pass, no sort needed
+    converted: Dict[str, List[ActualTransaction]] = {}
+    rates: Dict = {}
+    for t in transactions:
+        out = convert_to_actual_transaction(t, mapping, rates, rules)
+        if out:
+            converted.setdefault(out.account, []).append(out)
 
     return converted
 
@@ -69,5 +94,5 @@ def convert_to_actual_import(transactions: List[Dict], mapping: Dict):
 if __name__ == "__main__":
     with open("../data.json", "r") as f:
         data = json.load(f)
-        transactions = convert_to_actual_import(data)
+        transactions = convert_to_actual_import(data, {})
         pprint(transactions)
@@ -1,5 +1,6 @@
 import urllib.request
-import json
+
+from .serializer import loads
 
 base_url = (
     "https://cdn.jsdelivr.net/npm/@fawazahmed0/currency-api@latest/v1/currencies/"
@@ -10,6 +11,6 @@ def get_exchange_rate(currency: str):
     key = currency.lower()
     url = base_url + key + ".min.json"
     with urllib.request.urlopen(url) as response:
-        j = json.loads(response.read())
+        j = loads(response.read())
     vnd = j[key]["vnd"]
     return vnd
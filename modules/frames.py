@@ -0,0 +1,98 @@
+import io
+import os
+from typing import Optional
+
+try:
+    from PIL import Image, ImageChops
+except ImportError:
+    Image = None
+
+# Live view profiles a viewer can pick with /api/stream?profile=: (max width, JPEG quality).
+# "full" is the screenshot as taken, the others are downscaled from it.
+FRAME_PROFILES = {
+    "full": (1920, 50),
+    "medium": (960, 45),
+    "thumb": (480, 40),
+}
+DEFAULT_FRAME_PROFILE = "full"
+
+# Screenshot interval of the sync: back to the minimum when the page changes,
+# growing up to the maximum while it stays still (e.g. waiting for the OTP).
+# Never below the 0.5s of the old fixed loop, screenshots are Chromium work.
+FRAME_MIN_INTERVAL = max(0.5, float(os.getenv("FRAME_MIN_INTERVAL", "0.5")))
+FRAME_MAX_INTERVAL = float(os.getenv("FRAME_MAX_INTERVAL", "2.0"))
+# Share of pixels that must change for a frame to count as activity
+FRAME_CHANGE_THRESHOLD = float(os.getenv("FRAME_CHANGE_THRESHOLD", "0.002"))
+SCREENSHOT_QUALITY = FRAME_PROFILES["full"][1]
+
+# Gray level difference below which a pixel is JPEG noise, not a change
+_NOISE_LEVEL = 24
+_warned_no_pillow = False
+
+
+def _thumbnail(frame: bytes):
+    image = Image.open(io.BytesIO(frame))
+    # draft() lets the JPEG decoder scale down by up to 8x while decoding, far cheaper than a full decode
+    image.draft("L", (image.width // 8, image.height // 8))
+    return image.convert("L")
+
+
+class FrameDiffer:
+    """Measures how much consecutive screenshots differ, to adapt the screenshot rate.
+
+    `difference()` compares a frame to the last one passed to `reference()`, of which a
+    small grayscale copy is kept. Without Pillow frames can only be compared byte for
+    byte, which still catches a still page: Chromium encodes identical pixels to
+    identical JPEG bytes.
+    """
+
+    def __init__(self, threshold: float = FRAME_CHANGE_THRESHOLD):
+        self.threshold = threshold
+        self._frame: Optional[bytes] = None
+        self._thumbnail = None
+        self._last = (None, None) # Thumbnail decoded by the last difference(), reused by reference()
+
+    def difference(self, frame: bytes) -> float:
+        """Share of pixels (0-1) that differ from the last reference frame."""
+        if self._frame is None:
+            return 1.0
+        if frame == self._frame:
+            return 0.0
+        if Image is None or self._thumbnail is None:
+            return 1.0
+        thumbnail = _thumbnail(frame)
+        self._last = (frame, thumbnail)
+        if thumbnail.size != self._thumbnail.size:
+            return 1.0
+        histogram = ImageChops.difference(thumbnail, self._thumbnail).histogram()
+        return sum(histogram[_NOISE_LEVEL:]) / (thumbnail.width * thumbnail.height)
+
+    def reference(self, frame: bytes):
+        """Make `frame` the one the next frames are compared to, i.e. the last one sent."""
+        self._frame = frame
+        if Image is not None:
+            self._thumbnail = self._last[1] if self._last[0] is frame else _thumbnail(frame)
+        self._last = (None, None)
+
+
+def encode_frame(frame: bytes, profile: str) -> bytes:
+    """The screenshot scaled and re-encoded for a profile. Unchanged for "full" or without Pillow."""
+    global _warned_no_pillow
+    width, quality = FRAME_PROFILES[profile]
+    if profile == "full":
+        return frame
+    if Image is None:
+        if not _warned_no_pillow:
+            from .logger import logger
+            logger.warning("Live view profiles need Pillow (`pip install pillow`), sending full size frames")
+            _warned_no_pillow = True
+        return frame
+    image = Image.open(io.BytesIO(frame))
+    if image.width > width:
+        height = round(image.height * width / image.width)
+        # The JPEG decoder does most of the downscaling, resize only finishes it
+        image.draft("RGB", (width, height))
+        image = image.convert("RGB").resize((width, height), Image.BILINEAR)
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=quality, optimize=True)
+    return out.getvalue()
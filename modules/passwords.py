@@ -0,0 +1,30 @@
+import os
+from functools import lru_cache
+from passlib.context import CryptContext
+
+# Argon2 parameters, hashes keep their own parameters so changing these only affects new hashes
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "65536")) # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "4"))
+
+
+@lru_cache(maxsize=None)
+def get_context(time_cost: int = ARGON2_TIME_COST, memory_cost: int = ARGON2_MEMORY_COST, parallelism: int = ARGON2_PARALLELISM) -> CryptContext:
+    return CryptContext(
+        schemes=["argon2"],
+        deprecated="auto",
+        argon2__time_cost=time_cost,
+        argon2__memory_cost=memory_cost,
+        argon2__parallelism=parallelism,
+    )
+
+
+# Top level functions so they can run in a process pool. Kept free of app imports, so the
+# pool processes don't load the app when started by uvicorn. Under `python app.py` spawn
+# re-imports __main__ in each of them, which does import the database and the secret key.
+def hash_password(password: str) -> str:
+    return get_context().hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return get_context().verify(plain_password, hashed_password)
@@ -0,0 +1,69 @@
+import os
+import signal
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# (pid, start time) pairs: the start time tells a process apart from a later one reusing its pid.
+# Read from /proc, so this only works on Linux; elsewhere nothing is found and nothing is killed.
+Process = Tuple[int, int]
+
+
+def _stat(pid: int) -> Optional[Tuple[int, int]]:
+    """(parent pid, start time) of a process, None if it is gone (or a zombie waiting to be reaped)."""
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    # The command name is in parentheses and may contain spaces, the fields follow the last ")"
+    fields = data[data.rindex(b")") + 2:].split()
+    if fields[0] == b"Z":
+        return None
+    return int(fields[1]), int(fields[19])
+
+
+def _processes() -> Dict[int, Tuple[int, int]]:
+    processes = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return processes
+    for entry in entries:
+        if entry.isdigit():
+            stat = _stat(int(entry))
+            if stat:
+                processes[int(entry)] = stat
+    return processes
+
+
+def children(pid: int) -> Set[Process]:
+    return {(child, started) for child, (parent, started) in _processes().items() if parent == pid}
+
+
+def descendants(pids: Iterable[int]) -> Set[Process]:
+    """The given processes and everything they started, however deep."""
+    processes = _processes()
+    by_parent: Dict[int, List[int]] = {}
+    for pid, (parent, _) in processes.items():
+        by_parent.setdefault(parent, []).append(pid)
+    found: Set[Process] = set()
+    pending = [pid for pid in pids if pid in processes]
+    while pending:
+        pid = pending.pop()
+        found.add((pid, processes[pid][1]))
+        pending.extend(by_parent.get(pid, ()))
+    return found
+
+
+def kill(processes: Iterable[Process]) -> int:
+    """SIGKILL the processes that are still the ones recorded. Returns how many were killed."""
+    killed = 0
+    for pid, started in processes:
+        stat = _stat(pid)
+        if stat is None or stat[1] != started:
+            continue
+        try:
+            os.kill(pid, signal.SIGKILL)
+            killed += 1
+        except (ProcessLookupError, PermissionError):
+            pass
+    return killed
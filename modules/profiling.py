@@ -0,0 +1,104 @@
+import asyncio
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import tempfile
+import threading
+import time
+from typing import Callable, Optional
+
+
+class RunProfiler:
+    """cProfile plus asyncio task tracing for one sync run.
+
+    The event loop thread is profiled as a whole. Blocking calls sent to the executor
+    are wrapped with `wrap()` and get their own profile, merged into the result.
+    """
+
+    def __init__(self):
+        self._profile = cProfile.Profile()
+        self._thread_profiles: list[cProfile.Profile] = []
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._previous_factory = None
+        self._started = 0.0
+        self._running_tasks: dict[asyncio.Task, dict] = {}
+        self.tasks: list[dict] = []
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._previous_factory = self._loop.get_task_factory()
+        self._loop.set_task_factory(self._task_factory)
+        self._started = time.perf_counter()
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+        if self._loop is not None:
+            self._loop.set_task_factory(self._previous_factory)
+        for task, record in self._running_tasks.items():
+            record["state"] = "running"
+            self.tasks.append(record)
+        self._running_tasks.clear()
+
+    def _task_factory(self, loop, coro, **kwargs):
+        if self._previous_factory is not None:
+            task = self._previous_factory(loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        self._running_tasks[task] = {
+            "name": task.get_name(),
+            "coro": getattr(coro, "__qualname__", repr(coro)),
+            "started": round(time.perf_counter() - self._started, 4),
+        }
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task: asyncio.Task):
+        record = self._running_tasks.pop(task, None)
+        if record is None:
+            return
+        record["duration"] = round(time.perf_counter() - self._started - record["started"], 4)
+        if task.cancelled():
+            record["state"] = "cancelled"
+        elif task.exception() is not None:
+            record["state"] = f"error: {type(task.exception()).__name__}"
+        else:
+            record["state"] = "done"
+        self.tasks.append(record)
+
+    def wrap(self, fn: Callable) -> Callable:
+        def profiled(*args, **kwargs):
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profile.disable()
+                with self._lock:
+                    self._thread_profiles.append(profile)
+        return profiled
+
+    def dump(self) -> dict:
+        """pstats data (the format of `pstats.Stats.dump_stats`) and the task trace."""
+        stats = pstats.Stats(self._profile)
+        with self._lock:
+            for profile in self._thread_profiles:
+                stats.add(profile)
+        return {"pstats": marshal.dumps(stats.stats), "tasks": sorted(self.tasks, key=lambda t: t["started"])}
+
+
+def profile_text(data: bytes, sort: str = "cumulative", limit: int = 60) -> str:
+    """Readable summary of dumped pstats data, like `python -m pstats`."""
+    # pstats only loads from files
+    fd, path = tempfile.mkstemp(suffix=".prof")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+    finally:
+        os.remove(path)
@@ -0,0 +1,241 @@
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from re import _parser as sre_parse
+except ImportError: # Python < 3.11
+    import sre_parse
+
+# Rules are stored per user as a JSON list. Prefixes are stripped first, then the first matching
+# payee and category rules win, then every matching rename is applied in order:
+#   {"type": "strip_prefix", "value": "Giao dich thanh toan/..."}                      notes
+#   {"type": "payee", "keyword": "grab", "payee": "Grab"}                              description or payee contains keyword
+#   {"type": "category", "keyword": "highlands", "category": "<actual category id>"}   description or payee contains keyword
+#   {"type": "rename", "field": "payee" | "notes", "pattern": "regex", "replace": "..."}
+RULE_TYPES = {
+    "strip_prefix": ("value",),
+    "payee": ("keyword", "payee"),
+    "category": ("keyword", "category"),
+    "rename": ("field", "pattern", "replace"),
+}
+RENAME_FIELDS = ("payee", "notes")
+
+# Always applied before the user's rules, card purchases carry this boilerplate
+DEFAULT_RULES = [
+    {"type": "strip_prefix", "value": "Giao dich thanh toan/Purchase - So The/Card No:"},
+]
+
+# User patterns that refer to their own groups can't be merged into the combined regex
+_GROUP_REFERENCE = re.compile(r"\\[1-9]|\(\?P=")
+
+
+class RuleError(ValueError):
+    pass
+
+
+def _trie_regex(literals: Iterable[str]) -> str:
+    """One regex matching any of the literals, shaped as a trie.
+
+    Alternatives share their prefixes, so matching cost depends on the text, not on the
+    number of literals. Greedy optional tails make it match the longest literal at a position.
+    """
+    trie: dict = {}
+    for literal in literals:
+        node = trie
+        for char in literal:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node: dict) -> str:
+        end = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if end:
+            body = body if len(branches) == 1 and len(body) == 1 else f"(?:{body})"
+            return body + "?"
+        return body
+
+    return build(trie)
+
+
+def _required_literal(pattern: str) -> Optional[str]:
+    """Longest literal every match of `pattern` must contain, lowercased. None if there is no useful one."""
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return None
+    if parsed.state.flags & re.IGNORECASE:
+        # Case folding can match characters that lower() does not map, don't guess
+        return None
+    best, run = "", []
+    for op, arg in parsed:
+        if op is sre_parse.LITERAL:
+            run.append(chr(arg))
+        elif op is not sre_parse.AT: # \b, ^ and $ don't consume text
+            best, run = max(best, "".join(run), key=len), []
+    best = max(best, "".join(run), key=len)
+    return best.lower() if len(best) >= 2 else None
+
+
+class _LiteralMatcher:
+    """Every literal of the rule set found in one pass: a trie regex run at every position.
+
+    At each position the regex yields the longest literal; every shorter literal matching
+    there is a prefix of it, so the rules hit by each literal and its prefixes are precomputed.
+    """
+
+    def __init__(self, literals: Dict[str, List[Tuple[str, int]]]):
+        self._hits: Dict[str, Dict[str, frozenset]] = {}
+        for literal in literals:
+            hits: Dict[str, set] = {}
+            for end in range(1, len(literal) + 1):
+                for action, index in literals.get(literal[:end], ()):
+                    hits.setdefault(action, set()).add(index)
+            self._hits[literal] = {action: frozenset(indexes) for action, indexes in hits.items()}
+        self._regex = re.compile(f"(?=({_trie_regex(literals)}))") if literals else None
+
+    def match(self, text: str) -> Dict[str, set]:
+        """Rule indexes per action ("payee", "category", "rename") whose literal occurs in lowercased `text`."""
+        found: Dict[str, set] = {}
+        if self._regex is None:
+            return found
+        for m in self._regex.finditer(text):
+            for action, indexes in self._hits[m.group(1)].items():
+                found.setdefault(action, set()).update(indexes)
+        return found
+
+
+class _RenameMatcher:
+    """Regex renames for one field.
+
+    Every matching rename is applied in rule order, each to the result of the previous one.
+    Patterns with a required literal only run when the literal scan saw it in the current
+    value. The rest are merged into one alternation regex, and are only tried one by one
+    when it matches.
+    """
+
+    def __init__(self, rules: List[Tuple[int, str, str]], prefiltered: set, scan: Callable[[str], set]):
+        self._rules = {index: (re.compile(pattern), replace) for index, pattern, replace in rules}
+        self._order = sorted(self._rules)
+        self._prefiltered = prefiltered & set(self._rules)
+        self._scan = scan
+        rest = [(index, pattern) for index, pattern, _ in rules if index not in prefiltered]
+        # Patterns referring to their own groups can't be merged, they are always tried
+        combinable = [(index, pattern) for index, pattern in rest if not _GROUP_REFERENCE.search(pattern)]
+        self._gated = set()
+        self._gate = None
+        if combinable:
+            try:
+                self._gate = re.compile("|".join(f"(?:{pattern})" for _, pattern in combinable))
+                self._gated = {index for index, _ in combinable}
+            except re.error:
+                # e.g. the same group name in two patterns, or inline flags: try them all one by one
+                pass
+
+    def _gate_open(self, value: str) -> bool:
+        return self._gate is not None and self._gate.search(value) is not None
+
+    def apply(self, value: Optional[str], candidates: Iterable[int]) -> Optional[str]:
+        if not value or not self._rules:
+            return value
+        candidates = set(candidates)
+        gate_open = self._gate_open(value)
+        for index in self._order:
+            if index in self._prefiltered and index not in candidates:
+                continue
+            if index in self._gated and not gate_open:
+                continue
+            regex, replace = self._rules[index]
+            value, replaced = regex.subn(replace, value, count=1)
+            if replaced:
+                # The following rules see the renamed value
+                candidates = self._scan(value)
+                gate_open = self._gate_open(value)
+        return value
+
+
+class CompiledRules:
+    """A user's rules compiled once per sync and applied to every transaction.
+
+    Keywords and the required literals of regex renames go into one literal matcher, so the
+    cost per transaction follows the text length and the rules that actually hit, not the rule count.
+    """
+
+    def __init__(self, rules: List[dict]):
+        self.rules = rules
+        prefixes = [r["value"] for r in rules if r["type"] == "strip_prefix"]
+        self._prefix = re.compile(_trie_regex(prefixes)) if prefixes else None
+
+        literals: Dict[str, List[Tuple[str, int]]] = {}
+        prefiltered = set()
+        for index, rule in enumerate(rules):
+            if rule["type"] in ("payee", "category"):
+                literals.setdefault(rule["keyword"].lower(), []).append((rule["type"], index))
+            elif rule["type"] == "rename":
+                literal = _required_literal(rule["pattern"])
+                if literal:
+                    literals.setdefault(literal, []).append(("rename", index))
+                    prefiltered.add(index)
+        self._literals = _LiteralMatcher(literals)
+
+        self._renames = {
+            field: _RenameMatcher([
+                (index, r["pattern"], r["replace"])
+                for index, r in enumerate(rules)
+                if r["type"] == "rename" and r["field"] == field
+            ], prefiltered, self._rename_candidates)
+            for field in RENAME_FIELDS
+        }
+
+    def _rename_candidates(self, value: str) -> set:
+        return self._literals.match(value.lower()).get("rename", set())
+
+    def apply(self, description: str, payee: Optional[str]) -> Tuple[str, Optional[str], Optional[str]]:
+        """Returns (notes, payee, category) for a bank description and counterparty name."""
+        notes = description
+        if self._prefix is not None:
+            m = self._prefix.match(notes)
+            if m:
+                notes = notes[m.end():]
+
+        category = None
+        found = self._literals.match(f"{description}\n{payee or ''}".lower())
+        renames = found.get("rename", ())
+        if "payee" in found:
+            payee = self.rules[min(found["payee"])]["payee"]
+            # The mapped payee was not part of the scan
+            renames = self._literals.match(payee.lower()).get("rename", ())
+        if "category" in found:
+            category = self.rules[min(found["category"])]["category"]
+
+        payee = self._renames["payee"].apply(payee, renames)
+        notes = self._renames["notes"].apply(notes, found.get("rename", ()))
+        return notes, payee, category
+
+
+def validate_rules(rules: List[dict]) -> List[dict]:
+    """Check rules coming from the settings API. Raises RuleError with a readable message."""
+    for position, rule in enumerate(rules, start=1):
+        required = RULE_TYPES.get(rule.get("type"))
+        if required is None:
+            raise RuleError(f"Rule {position}: unknown type '{rule.get('type')}'")
+        for key in required:
+            if not isinstance(rule.get(key), str) or (key != "replace" and not rule[key]):
+                raise RuleError(f"Rule {position}: '{key}' is required")
+        if rule["type"] == "rename":
+            if rule["field"] not in RENAME_FIELDS:
+                raise RuleError(f"Rule {position}: field must be one of {', '.join(RENAME_FIELDS)}")
+            try:
+                re.compile(rule["pattern"])
+            except re.error as e:
+                raise RuleError(f"Rule {position}: invalid pattern ({e})")
+    return rules
+
+
+def compile_rules(rules: Optional[List[dict]] = None) -> CompiledRules:
+    return CompiledRules(DEFAULT_RULES + validate_rules(rules or []))
+
+
+DEFAULT_COMPILED_RULES = compile_rules()
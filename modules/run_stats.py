@@ -0,0 +1,40 @@
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+
+class RunStats:
+    """Counters and phase timings collected by a BankingService during one sync."""
+
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+        self.bytes_fetched = 0
+        self.account_counts: dict[str, int] = {}
+        self.imported = 0
+        self.skipped = 0
+        self.error_class: Optional[str] = None
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round(self.phases.get(name, 0.0) + time.perf_counter() - started, 3)
+
+    def count_import(self, transactions: int, result):
+        # Actual answers with the ids it added and updated, everything else was already there
+        data = result.get("data", result) if isinstance(result, dict) else {}
+        added = len(data.get("added") or []) if isinstance(data, dict) else 0
+        self.imported += added
+        self.skipped += max(transactions - added, 0)
+
+    def to_dict(self) -> dict:
+        return {
+            "phases": self.phases,
+            "bytes_fetched": self.bytes_fetched,
+            "account_counts": self.account_counts,
+            "imported": self.imported,
+            "skipped": self.skipped,
+            "error_class": self.error_class,
+        }
@@ -0,0 +1,73 @@
+import json
+import os
+from typing import Any, Callable, Union
+
+from .logger import logger
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+class Serializer:
+    def __init__(self, name: str, dumps: Callable[[Any], bytes], loads: Callable[[Union[str, bytes]], Any]):
+        self.name = name
+        self.dumps = dumps
+        self.loads = loads
+
+    def __repr__(self):
+        return f"Serializer({self.name})"
+
+
+def _default(obj: Any):
+    # Typed transaction structs (modules.transactions) are encoded as plain dicts
+    if msgspec is not None and isinstance(obj, msgspec.Struct):
+        return msgspec.to_builtins(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _stdlib_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+SERIALIZERS = {"stdlib": Serializer("stdlib", _stdlib_dumps, json.loads)}
+
+if orjson is not None:
+    SERIALIZERS["orjson"] = Serializer("orjson", lambda obj: orjson.dumps(obj, default=_default), orjson.loads)
+
+if msgspec is not None:
+    _msgspec_encoder = msgspec.json.Encoder()
+    _msgspec_decoder = msgspec.json.Decoder()
+    SERIALIZERS["msgspec"] = Serializer("msgspec", _msgspec_encoder.encode, _msgspec_decoder.decode)
+
+# Fastest available first
+_PREFERENCE = ["orjson", "msgspec", "stdlib"]
+
+
+def get_serializer(name: str = None) -> Serializer:
+    """Serializer by name ("orjson", "msgspec", "stdlib" or "auto").
+
+    Defaults to the SERIALIZER env var. A requested serializer that is not installed
+    falls back to the best available one, an unknown name is a ValueError.
+    """
+    name = (name or os.getenv("SERIALIZER", "auto")).lower()
+    if name != "auto" and name not in _PREFERENCE:
+        raise ValueError(f"Unknown SERIALIZER: {name}, expected one of auto, {', '.join(_PREFERENCE)}")
+    if name in SERIALIZERS:
+        return SERIALIZERS[name]
+    if name != "auto":
+        logger.warning(f"Serializer {name} is not installed, using the fastest available one")
+    for candidate in _PREFERENCE:
+        if candidate in SERIALIZERS:
+            return SERIALIZERS[candidate]
+
+
+serializer = get_serializer()
+dumps = serializer.dumps
+loads = serializer.loads
@@ -0,0 +1,141 @@
+import csv
+import os
+from typing import Iterable, List
+
+import msgspec
+
+from .serializer import dumps
+from .transactions import ActualTransaction
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+EXPORT_DIR = os.getenv("EXPORT_DIR", "data/exports")
+
+class SinkError(RuntimeError):
+    pass
+
+
+COLUMNS = ["imported_id", "date", "amount", "payee_name", "notes", "account", "category"]
+
+
+def _rows(transactions: Iterable) -> Iterable[dict]:
+    # Batches are ActualTransaction structs, or plain dicts when resumed from a checkpoint
+    for t in transactions:
+        yield msgspec.structs.asdict(t) if isinstance(t, ActualTransaction) else t
+
+
+class Sink:
+    """Streaming destination for converted transactions, written one batch at a time.
+
+    Batches are appended as they are produced, nothing is buffered across batches.
+    """
+
+    extension = ""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+    def write_batch(self, transactions: List):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class NDJSONSink(Sink):
+    extension = "ndjson"
+
+    def open(self):
+        super().open()
+        self._file = open(self.path, "wb")
+
+    def write_batch(self, transactions: List):
+        self._file.writelines(dumps(row) + b"\n" for row in _rows(transactions))
+
+    def close(self):
+        self._file.close()
+
+
+class CSVSink(Sink):
+    extension = "csv"
+
+    def open(self):
+        super().open()
+        self._file = open(self.path, "w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=COLUMNS, extrasaction="ignore")
+        self._writer.writeheader()
+
+    def write_batch(self, transactions: List):
+        self._writer.writerows(_rows(transactions))
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetSink(Sink):
+    """One row group per batch, so memory stays bounded by the batch size."""
+
+    extension = "parquet"
+
+    def open(self):
+        if pa is None:
+            raise SinkError("Parquet export needs pyarrow, install it with `pip install pyarrow`")
+        super().open()
+        self._schema = pa.schema([
+            ("imported_id", pa.string()),
+            ("date", pa.string()),
+            ("amount", pa.int64()),
+            ("payee_name", pa.string()),
+            ("notes", pa.string()),
+            ("account", pa.string()),
+            ("category", pa.string()),
+        ])
+        self._writer = pq.ParquetWriter(self.path, self._schema)
+
+    def write_batch(self, transactions: List):
+        if transactions:
+            self._writer.write_table(pa.Table.from_pylist(list(_rows(transactions)), schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+SINKS = {
+    "ndjson": NDJSONSink,
+    "csv": CSVSink,
+    "parquet": ParquetSink,
+}
+
+
+def open_sinks(names: Iterable[str], basename: str, directory: str = EXPORT_DIR) -> List[Sink]:
+    """Open the named sinks as <directory>/<basename>.<ext>.
+
+    Raises SinkError if one is unknown or can't be opened (the others are closed again),
+    so the export stage fails instead of being checkpointed without its files.
+    """
+    sinks = []
+    try:
+        for name in names:
+            cls = SINKS.get(name)
+            if not cls:
+                raise SinkError(f"Unknown export sink '{name}'")
+            sink = cls(os.path.join(directory, f"{basename}.{cls.extension}"))
+            try:
+                sink.open()
+            except SinkError:
+                raise
+            except Exception as e:
+                raise SinkError(f"Could not open {name} export: {e}") from e
+            sinks.append(sink)
+    except SinkError:
+        for sink in sinks:
+            sink.close()
+        raise
+    return sinks
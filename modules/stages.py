@@ -0,0 +1,73 @@
+import hashlib
+import json
+import uuid
+from typing import Optional
+
+# Stages of the sync pipeline, in order. Per-account imports are stored as "import:<account_id>".
+STAGE_FETCH = "fetch"
+STAGE_CONVERT = "convert"
+STAGE_EXPORT = "export"
+STAGE_ACTUAL_TOKEN = "actual_token"
+STAGE_IMPORT_PREFIX = "import:"
+STAGE_DONE = "done"
+
+
+def run_fingerprint(config: dict) -> str:
+    # Only the inputs that change the output of a stage, credentials are left out on purpose
+    key = {
+        "user_id": config.get("user_id"),
+        "tcb_username": config.get("tcb_username"),
+        "actual_url": config.get("actual_url"),
+        "actual_budget_id": config.get("actual_budget_id"),
+        "accounts_mapping": config.get("accounts_mapping", {}),
+        "date_from": config.get("date_from"),
+        "date_to": config.get("date_to"),
+    }
+    if config.get("rules"):
+        # Rules change the converted output, only added when set so older runs keep their fingerprint
+        key["rules"] = config["rules"]
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+class MemoryCheckpointStore:
+    """Checkpoints kept in memory, for runs without a database (the CLI).
+
+    Same interface as checkpoint.CheckpointStore. `initial_stages` are treated as already
+    done for every new run, e.g. {STAGE_FETCH: body} to replay a saved bank response.
+    """
+
+    def __init__(self, initial_stages: Optional[dict] = None):
+        self._initial_stages = dict(initial_stages or {})
+        self._runs: dict[str, dict] = {}
+
+    def new_run_id(self) -> str:
+        return uuid.uuid4().hex
+
+    def find_resumable(self, user_id: Optional[int], fingerprint: str) -> Optional[str]:
+        for run_id, run in reversed(self._runs.items()):
+            if run["user_id"] == user_id and run["fingerprint"] == fingerprint and STAGE_DONE not in run["stages"]:
+                return run_id
+        return None
+
+    def load(self, run_id: str) -> dict:
+        run = self._runs.get(run_id)
+        return dict(run["stages"] if run else self._initial_stages)
+
+    def save(self, run_id: str, user_id: Optional[int], fingerprint: str, stage: str, data=None):
+        # The run only exists once it saved a stage, like in checkpoint.CheckpointStore
+        run = self._runs.setdefault(run_id, {"stages": dict(self._initial_stages)})
+        run["user_id"] = user_id
+        run["fingerprint"] = fingerprint
+        run["stages"][stage] = data
+
+    def prune(self):
+        # Runs only live as long as the process
+        pass
+
+    def discard(self, run_id: str, stage: str):
+        run = self._runs.get(run_id)
+        if run:
+            run["stages"].pop(stage, None)
+
+    def complete(self, run_id: str, user_id: Optional[int], fingerprint: str):
+        self._runs[run_id] = {"user_id": user_id, "fingerprint": fingerprint, "stages": {STAGE_DONE: None}}
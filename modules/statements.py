@@ -0,0 +1,333 @@
+import codecs
+import csv
+import datetime
+import hashlib
+import os
+import re
+import time
+import unicodedata
+from decimal import Decimal, InvalidOperation
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional
+
+from . import actual, convert, rules
+from .logger import logger
+from .run_stats import RunStats
+from .transactions import BankTransaction, Money
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+# Transactions sent to Actual per request, memory stays bounded by this however long the statement is
+STATEMENT_BATCH_SIZE = int(os.getenv("STATEMENT_BATCH_SIZE", "500"))
+# Preamble rows (account holder, period, ...) scanned for the column header
+HEADER_SCAN_ROWS = 50
+# Days whose rows are remembered to number identical rows, see iter_statement
+OPEN_DAYS = 7
+
+_XLSX_MAGIC = b"PK\x03\x04"
+_XLS_MAGIC = b"\xd0\xcf\x11\xe0"
+# After "\n", or after "\r" unless a "\n" follows
+_LINE_END = re.compile(r"(?<=\n)|(?<=\r)(?=[^\n])")
+
+
+class StatementError(ValueError):
+    pass
+
+
+def _normalize(header) -> str:
+    # Bilingual headers like "Ngày giao dịch\nTransaction Date" -> "ngay giao dich transaction date"
+    text = unicodedata.normalize("NFKD", str(header or "")).replace("đ", "d").replace("Đ", "D")
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return " ".join(re.split(r"[\s/|()]+", text)).strip()
+
+
+def _has(header: str, *words: str) -> bool:
+    return any(re.search(rf"\b{word}\b", header) for word in words)
+
+
+# First matching column wins. Checked in this order, so "Remitter account" is not taken as the payee
+_COLUMNS = [
+    ("counter_party_account", lambda h: _has(h, "account", "tai khoan", "tk", "so tk") and _has(h, "remitter", "beneficiary", "counterparty", "doi tac", "doi ung")),
+    ("counter_party", lambda h: _has(h, "remitter", "beneficiary", "counterparty", "doi tac", "doi ung") and not _has(h, "bank", "ngan hang", "nh")),
+    ("date", lambda h: _has(h, "transaction date", "booking date", "ngay giao dich", "ngay hach toan", "date", "ngay")),
+    ("reference", lambda h: _has(h, "reference", "ref", "transaction no", "so tham chieu", "so but toan", "ma giao dich")),
+    ("description", lambda h: _has(h, "details", "description", "dien giai", "noi dung")),
+    ("debit", lambda h: _has(h, "debit", "ghi no")),
+    ("credit", lambda h: _has(h, "credit", "ghi co")),
+    ("amount", lambda h: _has(h, "amount", "so tien")),
+    ("currency", lambda h: _has(h, "currency", "ccy", "loai tien")),
+]
+
+
+def _header_columns(row: tuple) -> Optional[Dict[str, int]]:
+    """Column index per field if `row` is the statement's column header, else None."""
+    columns: Dict[str, int] = {}
+    for index, cell in enumerate(row):
+        header = _normalize(cell)
+        if not header:
+            continue
+        for field, matches in _COLUMNS:
+            if field not in columns and matches(header):
+                columns[field] = index
+                break
+    if "date" in columns and "description" in columns and ({"debit", "credit", "amount"} & columns.keys()):
+        return columns
+    return None
+
+
+def _parse_date(value) -> Optional[str]:
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    text = str(value or "").strip().split(" ")[0]
+    for fmt in ("%d/%m/%Y", "%d-%m-%Y", "%Y-%m-%d", "%d.%m.%Y"):
+        try:
+            return datetime.datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_amount(value) -> Optional[Decimal]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return Decimal(str(value))
+    text = re.sub(r"[^\d,.\-()]", "", str(value))
+    negative = text.startswith("-") or text.startswith("(")
+    text = text.strip("-()")
+    if not text:
+        return None
+    # The separator that comes last is the decimal one, unless it's the only kind and is
+    # repeated or followed by exactly three digits (VND amounts: "1.000.000", "1,000,000")
+    separators = set(re.findall(r"[,.]", text))
+    if separators:
+        last = max(text.rfind(","), text.rfind("."))
+        decimals = len(text) - last - 1
+        if len(separators) == 1 and (text.count(text[last]) > 1 or decimals == 3):
+            text = re.sub(r"[,.]", "", text)
+        else:
+            text = re.sub(r"[,.]", "", text[:last]) + "." + text[last + 1:]
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        return None
+    return -amount if negative else amount
+
+
+def _cell(row: tuple, columns: Dict[str, int], field: str):
+    index = columns.get(field)
+    if index is None or index >= len(row):
+        return None
+    value = row[index]
+    return value.strip() if isinstance(value, str) else value
+
+
+def _text_lines(file: BinaryIO, encoding: str) -> Iterator[str]:
+    """Decoded lines of `file`, line endings kept as csv.reader wants them.
+
+    Not io.TextIOWrapper: Starlette's upload file on Python 3.10 has no readable().
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    pending = ""
+    while True:
+        chunk = file.read(64 * 1024)
+        pending += decoder.decode(chunk, final=not chunk)
+        # A trailing "\r" stays pending, its "\n" may be in the next chunk
+        *lines, pending = _LINE_END.split(pending)
+        yield from lines
+        if not chunk:
+            break
+    if pending:
+        yield pending
+
+
+def _csv_rows(file: BinaryIO) -> Iterator[tuple]:
+    head = file.read(4096)
+    file.seek(0)
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        # Excel's "Unicode text" export
+        encoding = "utf-16"
+    else:
+        encoding = "utf-8-sig"
+    try:
+        dialect = csv.Sniffer().sniff(head.decode(encoding, errors="ignore"), delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    for row in csv.reader(_text_lines(file, encoding), dialect):
+        yield tuple(row)
+
+
+def _xlsx_rows(file: BinaryIO) -> Iterator[tuple]:
+    if openpyxl is None:
+        raise StatementError("XLSX statements need openpyxl, install it with `pip install openpyxl` or export the statement as CSV")
+    # read_only streams rows from the zip instead of loading the whole sheet
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield row
+    finally:
+        workbook.close()
+
+
+def statement_rows(file: BinaryIO) -> Iterator[tuple]:
+    """Raw rows of a CSV or XLSX statement, one at a time. `file` must be seekable."""
+    magic = file.read(4)
+    file.seek(0)
+    if magic == _XLSX_MAGIC:
+        return _xlsx_rows(file)
+    if magic == _XLS_MAGIC:
+        raise StatementError("Old .xls statements are not supported, save the statement as .xlsx or .csv")
+    return _csv_rows(file)
+
+
+def iter_statement(rows: Iterable[tuple], arrangement_id: str, currency: str = "VND") -> Iterator[BankTransaction]:
+    """BankTransactions from statement rows, in the shape convert.convert_to_actual_transaction expects.
+
+    Rows before the column header and rows without a valid date (totals, footers) are skipped.
+    Statements have no transaction ids, so `id` is a hash of the row: importing the same
+    file twice doesn't duplicate anything in Actual.
+    """
+    rows = iter(rows)
+    columns = None
+    for _, row in zip(range(HEADER_SCAN_ROWS), rows):
+        columns = _header_columns(row)
+        if columns:
+            break
+    if not columns:
+        raise StatementError("Could not find the column header (date, description, debit/credit) in the statement")
+    logger.info(f"Statement columns: {', '.join(sorted(columns, key=columns.get))}")
+
+    # Identical rows on the same day (two coffees at the same price) get a counter. Statements
+    # are in date order, so only the last few days are remembered to keep memory bounded.
+    seen: Dict[str, Dict[str, int]] = {}
+    evicted = set()
+    warned = False
+    for row in rows:
+        booking_date = _parse_date(_cell(row, columns, "date"))
+        if booking_date is None:
+            continue
+        debit = _parse_amount(_cell(row, columns, "debit"))
+        credit = _parse_amount(_cell(row, columns, "credit"))
+        if debit or credit:
+            # Some statements print debits as negative numbers
+            amount, is_debit = (abs(debit), True) if debit else (abs(credit), False)
+        else:
+            signed = _parse_amount(_cell(row, columns, "amount"))
+            if not signed:
+                continue
+            amount, is_debit = abs(signed), signed < 0
+
+        description = str(_cell(row, columns, "description") or "")
+        reference = str(_cell(row, columns, "reference") or "")
+        counter_party = _cell(row, columns, "counter_party")
+        counter_party_account = _cell(row, columns, "counter_party_account")
+
+        key = f"{arrangement_id}|{booking_date}|{'D' if is_debit else 'C'}{amount}|{reference}|{description}"
+        day = seen.get(booking_date)
+        if day is None:
+            if booking_date in evicted and not warned:
+                logger.warning(f"Statement is not in date order ({booking_date} again), identical rows of a day may be merged")
+                warned = True
+            day = seen[booking_date] = {}
+            if len(seen) > OPEN_DAYS:
+                oldest = next(iter(seen))
+                evicted.add(oldest)
+                del seen[oldest]
+        occurrence = day[key] = day.get(key, 0) + 1
+        if occurrence > 1:
+            key += f"|{occurrence}"
+
+        yield BankTransaction(
+            id="stmt-" + hashlib.sha1(key.encode()).hexdigest()[:24],
+            arrangement_id=arrangement_id,
+            booking_date=booking_date,
+            credit_debit_indicator="DBIT" if is_debit else "CRDT",
+            transaction_amount_currency=Money(amount=amount, currency_code=str(_cell(row, columns, "currency") or currency).upper()),
+            description=description,
+            counter_party_name=str(counter_party) if counter_party else None,
+            counter_party_account_number=str(counter_party_account) if counter_party_account else None,
+        )
+
+
+def resolve_arrangement(mapping: Dict, account: str) -> str:
+    """Arrangement id for a statement, given either an arrangement id or an Actual account id from the mapping."""
+    if account in mapping:
+        return account
+    for arrangement_id, account_id in mapping.items():
+        if account_id == account:
+            return arrangement_id
+    raise StatementError(f"Account '{account}' is not in the accounts mapping")
+
+
+def import_statement(
+    file: BinaryIO,
+    config: dict,
+    account: str,
+    currency: str = "VND",
+    batch_size: int = STATEMENT_BATCH_SIZE,
+) -> RunStats:
+    """Stream a statement file into Actual, `batch_size` transactions per request.
+
+    `config` is a sync config (sync_config.build_sync_config or the CLI's), only the
+    Actual credentials, accounts mapping, rules and dry_run are used. Blocking, run it
+    in a thread from async code.
+    """
+    mapping = config.get("accounts_mapping") or {}
+    arrangement_id = resolve_arrangement(mapping, account)
+    compiled_rules = rules.compile_rules(config.get("rules"))
+    stats = RunStats()
+    started = time.perf_counter()
+
+    actual_config = {
+        "url": config.get("actual_url"),
+        "password": config.get("actual_password"),
+        "budget_id": config.get("actual_budget_id"),
+        "budget_password": config.get("actual_budget_password"),
+    }
+    token = None
+    if config.get("dry_run"):
+        logger.info("Dry run, not importing to Actual")
+    else:
+        token = actual.init_actual(actual_config)
+        if not token:
+            raise Exception("Failed to get Actual Budget token")
+
+    def flush(batch: List) -> Optional[str]:
+        if not batch:
+            return token
+        account_id = batch[0].account
+        stats.account_counts[account_id] = stats.account_counts.get(account_id, 0) + len(batch)
+        if token is None:
+            return None
+        with stats.phase("import"):
+            result = actual.import_transactions(token, account_id, batch, actual_config["url"])
+            fresh = token
+            if result is None:
+                # The token may have expired during a long import, retry once with a new one
+                fresh = actual.init_actual(actual_config)
+                result = actual.import_transactions(fresh, account_id, batch, actual_config["url"]) if fresh else None
+            if result is None:
+                raise Exception(f"Failed to import transactions for account {account_id}")
+        stats.count_import(len(batch), result)
+        logger.info(f"Imported {sum(stats.account_counts.values())} statement transactions so far")
+        return fresh
+
+    rates: Dict = {}
+    batch: List = []
+    for transaction in iter_statement(statement_rows(file), arrangement_id, currency):
+        converted = convert.convert_to_actual_transaction(transaction, mapping, rates, compiled_rules)
+        if converted:
+            batch.append(converted)
+        if len(batch) >= batch_size:
+            token = flush(batch)
+            batch = []
+    token = flush(batch)
+
+    # Parsing and conversion are interleaved with the import, whatever wasn't the import is "convert"
+    stats.phases["convert"] = round(time.perf_counter() - started - stats.phases.get("import", 0.0), 3)
+    logger.info(f"Statement done: {sum(stats.account_counts.values())} transactions, {stats.imported} new in Actual")
+    return stats
@@ -0,0 +1,40 @@
+import base64
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+# Techcombank online banking API, shared by the browser flow, direct fetches and the scheduler
+TCB_BASE_URL = "https://onlinebanking.techcombank.com.vn"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:132.0) Gecko/20100101 Firefox/132.0"
+
+# Used when the token carries no expiry we can read
+BANK_TOKEN_DEFAULT_TTL = int(os.getenv("BANK_TOKEN_DEFAULT_TTL", "300")) # seconds
+
+
+def transactions_url(date_from: str, date_to: str, size: int = 500) -> str:
+    return f"{TCB_BASE_URL}/api/transaction-manager/client-api/v2/transactions?bookingDateGreaterThan={date_from}&bookingDateLessThan={date_to}&from=0&size={size}&orderBy=bookingDate&direction=DESC"
+
+
+def bank_headers(auth_token: str) -> dict:
+    return {
+        "User-Agent": USER_AGENT,
+        "Accept": "application/json",
+        "Accept-Language": "en-US,en;q=0.7,vi;q=0.3",
+        "Referer": f"{TCB_BASE_URL}/",
+        "Authorization": f"Bearer {auth_token}",
+    }
+
+
+def token_expiry(token: str, cookie_expires: Optional[float] = None) -> datetime:
+    """Expiry of a bank token: the JWT "exp" claim, else the cookie expiry, else the default TTL."""
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return datetime.fromtimestamp(int(claims["exp"]), tz=timezone.utc)
+    except Exception:
+        pass
+    # Playwright reports -1 for session cookies
+    if cookie_expires and cookie_expires > 0:
+        return datetime.fromtimestamp(cookie_expires, tz=timezone.utc)
+    return datetime.now(timezone.utc) + timedelta(seconds=BANK_TOKEN_DEFAULT_TTL)
@@ -0,0 +1,90 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Optional, Union
+
+import msgspec
+
+from .logger import logger
+
+
+class TransactionDataError(ValueError):
+    pass
+
+
+# Only the fields the converter uses are declared, msgspec skips everything else while decoding.
+# gc=False: these structs never hold reference cycles, so keep them out of the GC's tracking.
+class Money(msgspec.Struct, rename="camel", gc=False):
+    amount: Decimal # Decimal accepts both "1000.50" and 1000.5 exactly
+    currency_code: str = "VND"
+
+    @property
+    def minor_units(self) -> int:
+        return int((self.amount * 100).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+class BankTransaction(msgspec.Struct, rename="camel", gc=False):
+    id: str
+    arrangement_id: str
+    booking_date: str
+    credit_debit_indicator: str
+    transaction_amount_currency: Money
+    description: str = ""
+    counter_party_name: Optional[str] = None
+    counter_party_account_number: Optional[str] = None
+
+    @property
+    def is_debit(self) -> bool:
+        return self.credit_debit_indicator == "DBIT"
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BankTransaction":
+        return msgspec.convert(data, cls)
+
+
+class ActualTransaction(msgspec.Struct, gc=False, omit_defaults=True):
+    # Field names are the ones Actual's importTransactions expects
+    imported_id: str
+    date: str
+    amount: int # Signed, in minor units
+    payee_name: Optional[str]
+    notes: str
+    account: str
+    category: Optional[str] = None # Actual category id, set by a category rule
+
+
+# The API has answered with a few different envelopes over time
+class _Document(msgspec.Struct, rename="camel", gc=False):
+    list_transaction: list[BankTransaction] = []
+
+
+class _Envelope(msgspec.Struct, gc=False):
+    document: Optional[_Document] = None
+    transactions: Optional[list[BankTransaction]] = None
+    value: Optional[list[BankTransaction]] = None
+    data: Optional[list[BankTransaction]] = None
+
+
+_body_decoder = msgspec.json.Decoder(Union[list[BankTransaction], _Envelope])
+
+
+def decode_bank_body(body: Union[str, bytes]) -> list[BankTransaction]:
+    """Decode a transaction-manager response straight into BankTransaction structs.
+
+    Raises TransactionDataError when the body isn't JSON or a transaction is malformed
+    (the message names it, e.g. `$[1].arrangementId`), a bad body must not pass for an empty account.
+    """
+    try:
+        decoded = _body_decoder.decode(body)
+    except msgspec.DecodeError as e: # ValidationError included
+        raise TransactionDataError(f"Unexpected transaction data: {e}") from e
+
+    if isinstance(decoded, list):
+        # Direct list of transactions (from the proper API)
+        return decoded
+    if decoded.document is not None and decoded.document.list_transaction:
+        return decoded.document.list_transaction
+    for transactions in (decoded.transactions, decoded.value, decoded.data):
+        if transactions:
+            return transactions
+
+    logger.warning("Could not find a list of transactions in the response!")
+    return []
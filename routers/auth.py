@@ -1,16 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlmodel import Session, select
 from datetime import timedelta
+from typing import Optional
 
 from database import get_session
 from models import User
 from auth import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
     create_access_token,
-    get_password_hash,
-    verify_password,
-    get_current_user
+    get_password_hash_async,
+    verify_password_async,
+    get_current_user,
+    login_throttle,
+    PasswordHashBusy
 )
 from pydantic import BaseModel
 
@@ -24,17 +28,34 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
+def _busy():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication is busy, please retry",
+        headers={"Retry-After": "1"},
+    )
+
+# The endpoints are async to await the argon2 pool, their database calls still go to the threadpool
+def _find_user(session: Session, username: str) -> Optional[User]:
+    return session.exec(select(User).where(User.username == username)).first()
+
+def _add_user(session: Session, user: User) -> User:
+    session.add(user)
+    session.commit()
+    session.refresh(user)
+    return user
+
 @router.post("/register", response_model=Token)
-def register(user_in: UserRegister, session: Session = Depends(get_session)):
-    user = session.exec(select(User).where(User.username == user_in.username)).first()
+async def register(user_in: UserRegister, session: Session = Depends(get_session)):
+    user = await run_in_threadpool(_find_user, session, user_in.username)
     if user:
         raise HTTPException(status_code=400, detail="Username already registered")
     
-    hashed_password = get_password_hash(user_in.password)
-    user = User(username=user_in.username, password_hash=hashed_password)
-    session.add(user)
-    session.commit()
-    session.refresh(user)
+    try:
+        hashed_password = await get_password_hash_async(user_in.password)
+    except PasswordHashBusy:
+        raise _busy()
+    user = await run_in_threadpool(_add_user, session, User(username=user_in.username, password_hash=hashed_password))
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -43,14 +64,29 @@ def register(user_in: UserRegister, session: Session = Depends(get_session)):
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/token", response_model=Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(get_session)):
-    user = session.exec(select(User).where(User.username == form_data.username)).first()
-    if not user or not verify_password(form_data.password, user.password_hash):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(get_session)):
+    # Reject throttled usernames before spending any argon2 work on them
+    retry_after = login_throttle.retry_after(form_data.username)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts, try again later",
+            headers={"Retry-After": str(int(retry_after) + 1)},
+        )
+
+    user = await run_in_threadpool(_find_user, session, form_data.username)
+    try:
+        valid = bool(user) and await verify_password_async(form_data.password, user.password_hash)
+    except PasswordHashBusy:
+        raise _busy()
+    if not valid:
+        login_throttle.record_failure(form_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    login_throttle.reset(form_data.username)
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
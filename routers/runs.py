@@ -0,0 +1,67 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse, Response
+
+from models import User
+from auth import get_current_user
+from runs import run_store
+from sync_config import set_profile_next_run
+from modules.profiling import profile_text
+
+router = APIRouter(prefix="/api/runs", tags=["runs"])
+
+@router.get("/")
+def list_runs(
+    limit: int = Query(20, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_user)
+):
+    total, items = run_store.list_runs(current_user.id, limit=limit, offset=offset)
+    return {"total": total, "limit": limit, "offset": offset, "items": items}
+
+@router.get("/stats")
+def run_stats(
+    last: int = Query(50, ge=1, le=1000),
+    current_user: User = Depends(get_current_user)
+):
+    # Duration percentiles (p50/p95), per-phase p95 and error counts over the last N runs
+    return run_store.aggregates(current_user.id, last=last)
+
+@router.post("/profile-next")
+def profile_next_run(current_user: User = Depends(get_current_user)):
+    # Picked up by the next sync, manual or scheduled
+    if not set_profile_next_run(current_user.id, True):
+        raise HTTPException(status_code=400, detail="Settings not configured. Please go to Settings page.")
+    return {"message": "The next sync will be profiled"}
+
+@router.delete("/profile-next")
+def cancel_profile_next_run(current_user: User = Depends(get_current_user)):
+    set_profile_next_run(current_user.id, False)
+    return {"message": "Profiling cancelled"}
+
+@router.get("/{run_id}")
+def get_run(run_id: int, current_user: User = Depends(get_current_user)):
+    run = run_store.get(current_user.id, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return run
+
+@router.get("/{run_id}/profile")
+def get_run_profile(
+    run_id: int,
+    format: str = Query("pstats", pattern="^(pstats|text|tasks)$"),
+    sort: str = Query("cumulative", pattern="^(cumulative|tottime|ncalls)$"),
+    current_user: User = Depends(get_current_user)
+):
+    # pstats: load with `python -m pstats` or snakeviz; text: top functions; tasks: asyncio task trace
+    profile = run_store.get_profile(current_user.id, run_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="No profile for this run")
+    if format == "tasks":
+        return profile["tasks"]
+    if format == "text":
+        return PlainTextResponse(profile_text(profile["pstats"], sort=sort))
+    return Response(
+        profile["pstats"],
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="sync-run-{run_id}.prof"'},
+    )
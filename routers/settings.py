@@ -2,10 +2,13 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session, select
 from pydantic import BaseModel
 from typing import Optional
+import json
 
 from database import get_session
 from models import User, Settings
 from auth import get_current_user, encrypt_value, decrypt_value
+from modules.sinks import SINKS
+from modules.rules import RuleError, validate_rules
 
 router = APIRouter(prefix="/api/settings", tags=["settings"])
 
@@ -17,6 +20,9 @@ class SettingsSchema(BaseModel):
     actual_budget_id: str
     actual_budget_password: Optional[str] = None
     accounts_mapping: str = "{}"
+    export_sinks: list[str] = []
+    rules: list[dict] = []
+    sync_interval_minutes: int = 0 # 0 disables scheduled syncs
 
 @router.get("/", response_model=SettingsSchema)
 def get_settings(current_user: User = Depends(get_current_user), session: Session = Depends(get_session)):
@@ -30,7 +36,10 @@ def get_settings(current_user: User = Depends(get_current_user), session: Sessio
             "actual_password": "",
             "actual_budget_id": "",
             "actual_budget_password": "",
-            "accounts_mapping": "{}"
+            "accounts_mapping": "{}",
+            "export_sinks": [],
+            "rules": [],
+            "sync_interval_minutes": 0
         }
     
     # Decrypt
@@ -41,11 +50,25 @@ def get_settings(current_user: User = Depends(get_current_user), session: Sessio
         "actual_password": decrypt_value(settings_db.actual_password_enc),
         "actual_budget_id": settings_db.actual_budget_id,
         "actual_budget_password": decrypt_value(settings_db.actual_budget_password_enc) if settings_db.actual_budget_password_enc else "",
-        "accounts_mapping": settings_db.accounts_mapping
+        "accounts_mapping": settings_db.accounts_mapping,
+        "export_sinks": json.loads(settings_db.export_sinks or "[]"),
+        "rules": json.loads(settings_db.rules or "[]"),
+        "sync_interval_minutes": settings_db.sync_interval_minutes or 0
     }
 
 @router.post("/")
 def save_settings(settings: SettingsSchema, current_user: User = Depends(get_current_user), session: Session = Depends(get_session)):
+    unknown_sinks = set(settings.export_sinks) - set(SINKS)
+    if unknown_sinks:
+        raise HTTPException(status_code=400, detail=f"Unknown export sinks: {', '.join(sorted(unknown_sinks))}")
+    export_sinks = json.dumps(settings.export_sinks)
+    try:
+        rules = json.dumps(validate_rules(settings.rules))
+    except RuleError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if settings.sync_interval_minutes < 0:
+        raise HTTPException(status_code=400, detail="Sync interval must be 0 (off) or a number of minutes")
+
     settings_db = session.exec(select(Settings).where(Settings.user_id == current_user.id)).first()
     
     # Encrypt
@@ -62,7 +85,10 @@ def save_settings(settings: SettingsSchema, current_user: User = Depends(get_cur
             actual_password_enc=act_pass_enc,
             actual_budget_id=settings.actual_budget_id,
             actual_budget_password_enc=act_bud_pass_enc,
-            accounts_mapping=settings.accounts_mapping
+            accounts_mapping=settings.accounts_mapping,
+            export_sinks=export_sinks,
+            rules=rules,
+            sync_interval_minutes=settings.sync_interval_minutes
         )
         session.add(settings_db)
     else:
@@ -73,6 +99,12 @@ def save_settings(settings: SettingsSchema, current_user: User = Depends(get_cur
         settings_db.actual_budget_id = settings.actual_budget_id
         settings_db.actual_budget_password_enc = act_bud_pass_enc
         settings_db.accounts_mapping = settings.accounts_mapping
+        settings_db.export_sinks = export_sinks
+        settings_db.rules = rules
+        if settings_db.sync_interval_minutes != settings.sync_interval_minutes:
+            # Let the scheduler pick a fresh slot for the new interval
+            settings_db.sync_interval_minutes = settings.sync_interval_minutes
+            settings_db.next_sync_at = None
         session.add(settings_db)
         
     session.commit()
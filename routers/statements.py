@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from sqlmodel import Session, select
+
+from database import get_session
+from models import User, Settings, utcnow
+from auth import get_current_user
+from runs import run_store
+from service import AppStatus
+from sync_config import build_sync_config
+from modules.logger import logger
+from modules.statements import StatementError, import_statement
+
+router = APIRouter(prefix="/api/statements", tags=["statements"])
+
+# Plain def: FastAPI runs it in the threadpool, the import is blocking (parsing and urllib).
+# The upload is spooled to a temp file by Starlette and read row by row from there.
+@router.post("/import")
+def import_statement_file(
+    file: UploadFile = File(...),
+    account: str = Form(...), # Arrangement id or Actual account id from the accounts mapping
+    currency: str = Form("VND"),
+    dry_run: bool = Form(False),
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    settings_db = session.exec(select(Settings).where(Settings.user_id == current_user.id)).first()
+    if not settings_db:
+        raise HTTPException(status_code=400, detail="Settings not configured. Please go to Settings page.")
+    config = build_sync_config(settings_db)
+    config["dry_run"] = dry_run
+
+    started_at = utcnow()
+    logger.info(f"Importing statement {file.filename} for user {current_user.id}")
+    try:
+        stats = import_statement(file.file, config, account, currency=currency).to_dict()
+    except StatementError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Statement import failed: {e}")
+        run_store.record(current_user.id, None, None, AppStatus.ERROR.value, started_at, error_class=type(e).__name__)
+        raise HTTPException(status_code=502, detail=str(e))
+
+    # Dry runs are previews, only real imports go to the run history
+    run_id = None if dry_run else run_store.record(current_user.id, None, None, AppStatus.SUCCESS.value, started_at, stats=stats)
+    return {
+        "id": run_id,
+        "dry_run": dry_run,
+        "transactions": sum(stats["account_counts"].values()),
+        **stats,
+    }
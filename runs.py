@@ -0,0 +1,147 @@
+import json
+import math
+from datetime import datetime
+from typing import Optional
+
+from sqlmodel import Session, select, func
+
+from database import engine
+from models import SyncRun, SyncProfile, utcnow
+
+
+def _percentile(values: list[float], pct: float) -> Optional[float]:
+    # Nearest-rank, good enough for a handful of runs
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+def _run_view(run: SyncRun) -> dict:
+    return {
+        "id": run.id,
+        "job_id": run.job_id,
+        "run_id": run.run_id,
+        "status": run.status,
+        "error_class": run.error_class,
+        "attempts": run.attempts,
+        "started_at": run.started_at,
+        "finished_at": run.finished_at,
+        "duration_seconds": run.duration_seconds,
+        "phases": json.loads(run.phases or "{}"),
+        "bytes_fetched": run.bytes_fetched,
+        "transactions": run.transactions,
+        "account_counts": json.loads(run.account_counts or "{}"),
+        "imported": run.imported,
+        "skipped": run.skipped,
+        "profiled": run.profiled,
+    }
+
+
+class RunStore:
+    """History of finished sync runs. Queries go through the (user_id, started_at) index."""
+
+    def record(
+        self,
+        user_id: int,
+        job_id: Optional[int],
+        run_id: Optional[str],
+        status: str,
+        started_at: datetime,
+        attempts: int = 1,
+        stats: Optional[dict] = None,
+        error_class: Optional[str] = None,
+    ) -> int:
+        stats = stats or {}
+        finished_at = utcnow()
+        account_counts = stats.get("account_counts") or {}
+        run = SyncRun(
+            user_id=user_id,
+            job_id=job_id,
+            run_id=run_id,
+            status=status,
+            error_class=error_class or stats.get("error_class"),
+            attempts=attempts,
+            started_at=started_at,
+            finished_at=finished_at,
+            duration_seconds=round((finished_at - started_at).total_seconds(), 3),
+            phases=json.dumps(stats.get("phases") or {}),
+            bytes_fetched=stats.get("bytes_fetched", 0),
+            transactions=sum(account_counts.values()),
+            account_counts=json.dumps(account_counts),
+            imported=stats.get("imported", 0),
+            skipped=stats.get("skipped", 0),
+        )
+        with Session(engine) as session:
+            session.add(run)
+            session.commit()
+            session.refresh(run)
+            return run.id
+
+    def save_profile(self, run_id: int, profile: dict):
+        with Session(engine) as session:
+            session.add(SyncProfile(run_id=run_id, pstats=profile["pstats"], tasks=json.dumps(profile["tasks"])))
+            run = session.get(SyncRun, run_id)
+            run.profiled = True
+            session.add(run)
+            session.commit()
+
+    def get_profile(self, user_id: int, run_id: int) -> Optional[dict]:
+        with Session(engine) as session:
+            run = session.get(SyncRun, run_id)
+            profile = session.get(SyncProfile, run_id) if run and run.user_id == user_id else None
+            if not profile:
+                return None
+            return {"pstats": profile.pstats, "tasks": json.loads(profile.tasks or "[]")}
+
+    def list_runs(self, user_id: int, limit: int = 20, offset: int = 0) -> tuple[int, list[dict]]:
+        with Session(engine) as session:
+            total = session.exec(select(func.count()).select_from(SyncRun).where(SyncRun.user_id == user_id)).one()
+            rows = session.exec(
+                select(SyncRun)
+                .where(SyncRun.user_id == user_id)
+                .order_by(SyncRun.started_at.desc())
+                .offset(offset)
+                .limit(limit)
+            ).all()
+            return total, [_run_view(row) for row in rows]
+
+    def get(self, user_id: int, run_id: int) -> Optional[dict]:
+        with Session(engine) as session:
+            run = session.get(SyncRun, run_id)
+            return _run_view(run) if run and run.user_id == user_id else None
+
+    def aggregates(self, user_id: int, last: int = 50) -> dict:
+        """Duration percentiles and totals over the user's last `last` runs."""
+        with Session(engine) as session:
+            rows = session.exec(
+                select(SyncRun.status, SyncRun.duration_seconds, SyncRun.phases, SyncRun.error_class)
+                .where(SyncRun.user_id == user_id)
+                .order_by(SyncRun.started_at.desc())
+                .limit(last)
+            ).all()
+
+        durations = [row.duration_seconds for row in rows]
+        phases: dict[str, list[float]] = {}
+        errors: dict[str, int] = {}
+        for row in rows:
+            for name, seconds in json.loads(row.phases or "{}").items():
+                phases.setdefault(name, []).append(seconds)
+            if row.error_class:
+                errors[row.error_class] = errors.get(row.error_class, 0) + 1
+
+        return {
+            "runs": len(rows),
+            "succeeded": sum(1 for row in rows if row.status == "success"),
+            "duration": {
+                "avg": round(sum(durations) / len(durations), 3) if durations else None,
+                "p50": _percentile(durations, 50),
+                "p95": _percentile(durations, 95),
+                "max": max(durations, default=None),
+            },
+            "phases_p95": {name: _percentile(values, 95) for name, values in phases.items()},
+            "errors": errors,
+        }
+
+
+run_store = RunStore()
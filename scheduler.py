@@ -0,0 +1,130 @@
+import asyncio
+import os
+import random
+from datetime import timedelta
+from typing import Optional
+
+import httpx
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from database import engine
+from jobstore import JobStore, JobConflict, get_job_store
+from models import Settings, utcnow
+from modules import transactions
+from modules.logger import logger
+from modules.tcb import transactions_url, bank_headers
+from sync_config import build_sync_config
+from token_vault import token_vault
+
+SCHEDULER_TICK = float(os.getenv("SCHEDULER_TICK", "30")) # seconds
+# Random spread added to every interval, as a fraction of it (0.2 = up to +/-20%)
+SCHEDULER_JITTER = float(os.getenv("SCHEDULER_JITTER", "0.2"))
+# Scheduled runs wait while this many syncs are queued or running, across all users
+SCHEDULER_MAX_CONCURRENT = int(os.getenv("SCHEDULER_MAX_CONCURRENT", "2"))
+
+
+def _aware(value):
+    return value if value is None or value.tzinfo else value.replace(tzinfo=utcnow().tzinfo)
+
+
+def next_run_after(now, interval_minutes: int):
+    interval = interval_minutes * 60
+    return now + timedelta(seconds=interval + random.uniform(-SCHEDULER_JITTER, SCHEDULER_JITTER) * interval)
+
+
+class SyncScheduler:
+    """Enqueues syncs for users with a sync interval, spread out with jitter.
+
+    Safe to run in several API processes: a due run is only taken by the process
+    that manages to move its next_sync_at forward.
+    """
+
+    def __init__(self, store: Optional[JobStore] = None):
+        self.store = store or get_job_store()
+        self._stopping = False
+
+    async def run_forever(self):
+        logger.info("Sync scheduler started")
+        while not self._stopping:
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error(f"Scheduler tick failed: {e}")
+            await asyncio.sleep(SCHEDULER_TICK)
+
+    def stop(self):
+        self._stopping = True
+
+    def _due(self) -> list[Settings]:
+        now = utcnow()
+        with Session(engine) as session:
+            rows = session.exec(select(Settings).where(Settings.sync_interval_minutes > 0)).all()
+            return [row for row in rows if row.next_sync_at is None or _aware(row.next_sync_at) <= now]
+
+    def _advance(self, row: Settings, next_sync_at) -> bool:
+        # Compare-and-set on the old value, only one process gets to run this slot
+        with Session(engine) as session:
+            result = session.exec(
+                update(Settings)
+                .where(Settings.id == row.id, Settings.next_sync_at == row.next_sync_at if row.next_sync_at else Settings.next_sync_at.is_(None))
+                .values(next_sync_at=next_sync_at)
+            )
+            session.commit()
+            return result.rowcount == 1
+
+    async def tick(self):
+        loop = asyncio.get_running_loop()
+        for row in await loop.run_in_executor(None, self._due):
+            now = utcnow()
+            if row.next_sync_at is None:
+                # Newly scheduled, start somewhere in the first interval so users don't line up
+                first = now + timedelta(seconds=random.uniform(0, row.sync_interval_minutes * 60))
+                await loop.run_in_executor(None, self._advance, row, first)
+                continue
+
+            if await loop.run_in_executor(None, self.store.active_count) >= SCHEDULER_MAX_CONCURRENT:
+                # Leave next_sync_at as is and retry on the next tick. Later rows still get
+                # looked at, newly scheduled ones need their first next_sync_at.
+                logger.debug(f"Scheduler at concurrency limit, postponing the sync of user {row.user_id}")
+                continue
+
+            if not await loop.run_in_executor(None, self._advance, row, next_run_after(now, row.sync_interval_minutes)):
+                continue
+
+            if await self._unchanged(row):
+                logger.info(f"Scheduled sync for user {row.user_id} skipped, no new transactions")
+                continue
+
+            try:
+                config = build_sync_config(row)
+                job_id = await loop.run_in_executor(None, self.store.enqueue, row.user_id, config)
+                logger.info(f"Scheduled sync job {job_id} for user {row.user_id}")
+            except JobConflict:
+                logger.info(f"Scheduled sync for user {row.user_id} skipped, a sync is already running")
+
+    async def _unchanged(self, row: Settings) -> bool:
+        """True when the newest bank transaction is still the last synced one.
+
+        Only checked with a cached bank token, without one we cannot tell cheaply and just run.
+        """
+        if not row.sync_watermark:
+            return False
+        auth_token = await asyncio.get_running_loop().run_in_executor(None, token_vault.get, row.user_id)
+        if not auth_token:
+            return False
+        today = utcnow().date()
+        url = transactions_url((today - timedelta(days=30)).isoformat(), today.isoformat(), size=1)
+        try:
+            async with httpx.AsyncClient(timeout=15) as client:
+                response = await client.get(url, headers=bank_headers(auth_token))
+        except httpx.HTTPError:
+            return False
+        if response.status_code != 200:
+            return False
+        try:
+            newest = transactions.decode_bank_body(response.content)
+        except transactions.TransactionDataError:
+            # Let the sync run and report it
+            return False
+        return bool(newest) and newest[0].id == row.sync_watermark
@@ -1,12 +1,31 @@
 import asyncio
-import json
 import logging
 import datetime
+import os
+import time
+import httpx
 from enum import Enum
-from typing import Optional
+from typing import Callable, Optional
 from playwright.async_api import async_playwright, Playwright, Page, Browser, BrowserContext, expect
-from modules import convert, actual
+from modules import convert, actual, transactions, sinks, rules, frames, proctree
+from modules.profiling import RunProfiler
 from modules.logger import logger
+from modules.run_stats import RunStats
+from modules.tcb import TCB_BASE_URL, USER_AGENT, transactions_url, bank_headers, token_expiry
+from modules.stages import (
+    MemoryCheckpointStore,
+    run_fingerprint,
+    STAGE_FETCH,
+    STAGE_CONVERT,
+    STAGE_EXPORT,
+    STAGE_ACTUAL_TOKEN,
+    STAGE_IMPORT_PREFIX,
+)
+
+# Deadline of each step closing the browser (screenshots, context, browser, driver)
+TEARDOWN_STEP_SECONDS = float(os.getenv("SYNC_TEARDOWN_STEP_SECONDS", "3"))
+# How long stop_sync waits for the sync to wind down before killing the browser
+STOP_TIMEOUT = float(os.getenv("SYNC_STOP_TIMEOUT", "5"))
 
 class AppStatus(str, Enum):
     IDLE = "idle"
@@ -34,7 +53,16 @@ class ListHandler(logging.Handler):
              self.log_list.popleft()
 
 class BankingService:
-    def __init__(self):
+    # Only imports from modules/ at module level, so the CLI can run a sync without the
+    # web app or the database. The worker passes the database-backed stores in.
+    def __init__(
+        self,
+        on_change: Optional[Callable[[dict], None]] = None,
+        on_frame: Optional[Callable[[bytes], None]] = None,
+        checkpoints=None,
+        tokens=None,
+        on_watermark: Optional[Callable[[Optional[int], str], None]] = None,
+    ):
         self._status = AppStatus.IDLE
         self._last_error = ""
         self._running = False
@@ -42,8 +70,25 @@ class BankingService:
         self._browser = None
         self._context = None
         self._page = None
+        self._driver_processes: set = set()
         self._latest_screenshot: Optional[bytes] = None
         self._logs = deque(maxlen=50)
+        self._run_id: Optional[str] = None
+        self._fingerprint = ""
+        self._skipped_stages: list[str] = []
+        self._watermark: Optional[str] = None
+        self._stats = RunStats()
+        self._profiler: Optional[RunProfiler] = None
+        self._sync_task: Optional[asyncio.Task] = None
+
+        # Hooks so the owner (a worker) can publish progress to the shared job store
+        self._on_change = on_change
+        self._on_frame = on_frame
+
+        # checkpoint.CheckpointStore or an in-memory one, token_vault.TokenVault or None
+        self._checkpoints = checkpoints or MemoryCheckpointStore()
+        self._tokens = tokens
+        self._on_watermark = on_watermark
         
         # Attach handler
         self._log_handler = ListHandler(self._logs)
@@ -61,63 +106,149 @@ class BankingService:
     def last_error(self) -> str:
         return self._last_error
 
+    @property
+    def run_id(self) -> Optional[str]:
+        return self._run_id
+
+    @property
+    def skipped_stages(self) -> list[str]:
+        return list(self._skipped_stages)
+
     def get_latest_screenshot(self) -> Optional[bytes]:
         return self._latest_screenshot
 
-    async def start_sync(self, config: dict):
+    def snapshot(self) -> dict:
+        return {
+            "status": self._status.value,
+            "last_error": self._last_error,
+            "run_id": self._run_id,
+            "skipped_stages": list(self._skipped_stages),
+        }
+
+    def run_stats(self) -> dict:
+        # Phase timings and counters of the current run, recorded in the run history once it ends
+        return self._stats.to_dict()
+
+    def profile_data(self) -> Optional[dict]:
+        # Only set when the run was started with config["profile"]
+        return self._profiler.dump() if self._profiler else None
+
+    def _notify(self):
+        if self._on_change:
+            try:
+                self._on_change(self.snapshot())
+            except Exception as e:
+                logger.debug(f"Failed to publish status: {e}")
+
+    async def wait(self):
+        # Wait until the current sync task is done
+        if self._sync_task:
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+
+    async def start_sync(self, config: dict, resume: bool = True):
         if self._running:
             raise Exception("Sync already in progress")
         self._running = True
         self._config = config
+        self._resolve_date_range()
+        self._last_error = ""
+        self._skipped_stages = []
+        self._stats = RunStats()
+        self._profiler = RunProfiler() if config.get("profile") else None
+
+        # Resume the last failed run with the same inputs, otherwise start a new one
+        self._fingerprint = run_fingerprint(config)
+        self._checkpoints.prune()
+        self._run_id = self._checkpoints.find_resumable(config.get("user_id"), self._fingerprint) if resume else None
+        if self._run_id:
+            logger.info(f"Resuming sync run {self._run_id}")
+        else:
+            self._run_id = self._checkpoints.new_run_id()
+        self._notify()
         # Store the task so we can cancel it
         self._sync_task = asyncio.create_task(self._run_process())
 
     async def stop_sync(self):
         logger.info("Stop requested by user")
         self._running = False
-        # Cancel the sync task if it exists
-        if hasattr(self, '_sync_task') and self._sync_task and not self._sync_task.done():
-            self._sync_task.cancel()
-            try:
-                await self._sync_task
-            except asyncio.CancelledError:
-                logger.info("Sync task cancelled successfully")
+        # Cancel the sync task if it exists, its teardown gets STOP_TIMEOUT seconds
+        # before the browser is killed under it. Recorded as the "stop" phase.
+        with self._stats.phase("stop"):
+            if self._sync_task and not self._sync_task.done():
+                self._sync_task.cancel()
+                done, _ = await asyncio.wait({self._sync_task}, timeout=STOP_TIMEOUT)
+                if not done:
+                    logger.warning(f"Sync did not stop within {STOP_TIMEOUT}s, killing the browser")
+                    self.kill_browser()
+                    # Playwright calls fail fast once the browser is gone
+                    done, _ = await asyncio.wait({self._sync_task}, timeout=TEARDOWN_STEP_SECONDS)
+                if done:
+                    logger.info("Sync task cancelled successfully")
+                else:
+                    logger.error("Sync task is still running after the browser was killed, giving up on it")
+        logger.info(f"Stopped in {self._stats.phases['stop']:.2f}s")
         self._set_status(AppStatus.IDLE)
 
     def _set_status(self, status: AppStatus):
         self._status = status
         logger.info(f"Status changed to: {status}")
+        self._notify()
+
+    def _resolve_date_range(self):
+        # Use custom dates if provided, otherwise default to last 30 days.
+        # Resolved up front so a retry on the same day maps to the same run.
+        if self._config.get("date_from") and self._config.get("date_to"):
+            logger.info(f"Using custom date range: {self._config['date_from']} to {self._config['date_to']}")
+        else:
+            today = datetime.datetime.now().strftime("%Y-%m-%d")
+            month_ago = (datetime.datetime.now() - datetime.timedelta(days=30)).strftime("%Y-%m-%d")
+            self._config["date_from"] = month_ago
+            self._config["date_to"] = today
+            logger.info(f"Using default date range (last 30 days): {month_ago} to {today}")
+
+    def _save_checkpoint(self, stage: str, data=None):
+        self._checkpoints.save(self._run_id, self._config.get("user_id"), self._fingerprint, stage, data)
+
+    def _skip_stage(self, stage: str):
+        self._skipped_stages.append(stage)
+        logger.info(f"Skipping stage '{stage}' (checkpoint found)")
+        self._notify()
+
+    async def _run_blocking(self, fn, *args):
+        # Executor calls are profiled separately, cProfile only sees its own thread
+        if self._profiler:
+            fn = self._profiler.wrap(fn)
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
 
     async def _run_process(self):
-        screenshot_task = None
+        if self._profiler:
+            logger.info("Profiling this run")
+            self._profiler.start()
         try:
-            self._set_status(AppStatus.STARTING)
-            async with async_playwright() as self._playwright:
-                self._browser = await self._playwright.chromium.launch(
-                    headless=True,
-                    args=[
-                        "--no-sandbox",
-                        "--disable-dev-shm-usage",
-                        "--disable-gpu",
-                        "--window-size=1920,1080",
-                    ],
-                )
-                
-                self._context = await self._browser.new_context(
-                    viewport={"width": 1920, "height": 1080},
-                    user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:132.0) Gecko/20100101 Firefox/132.0",
-                )
-                
-                self._page = await self._context.new_page()
-                
-                # Start background screenshot task
-                screenshot_task = asyncio.create_task(self._screenshot_loop())
+            checkpoints = self._checkpoints.load(self._run_id)
 
-                if self._running:
-                    await self._process_login()
-                
-                if self._running:
-                    await self._process_fetch()
+            if STAGE_FETCH in checkpoints:
+                # Bank data already fetched, no browser or login needed
+                self._skip_stage("login")
+                self._skip_stage(STAGE_FETCH)
+                body = checkpoints[STAGE_FETCH]
+            else:
+                with self._stats.phase("fetch"):
+                    body = await self._fetch_direct()
+                if body is not None:
+                    self._skip_stage("login")
+                    self._save_checkpoint(STAGE_FETCH, body)
+                elif self._running:
+                    body = await self._run_browser()
+
+            if self._running and body is not None:
+                await self._process_save(body, checkpoints)
+                self._checkpoints.complete(self._run_id, self._config.get("user_id"), self._fingerprint)
+                if self._watermark and self._on_watermark:
+                    self._on_watermark(self._config.get("user_id"), self._watermark)
 
         except asyncio.CancelledError:
             logger.info("Sync process cancelled")
@@ -136,40 +267,143 @@ class BankingService:
             else:
                 logger.error(f"Error during sync: {err_msg}")
                 self._last_error = err_msg
+                self._stats.error_class = type(e).__name__
                 self._set_status(AppStatus.ERROR)
         finally:
+            if self._profiler:
+                self._profiler.stop()
             self._running = False
-            if screenshot_task:
-                screenshot_task.cancel()
-                try:
-                    await screenshot_task
-                except asyncio.CancelledError:
-                    pass
-                
-            if self._context:
-                try: await self._context.close()
-                except: pass
-            if self._browser:
-                try: await self._browser.close()
-                except: pass
-            
             if self._status != AppStatus.ERROR and self._status != AppStatus.SUCCESS:
                  self._set_status(AppStatus.IDLE)
 
+    async def _run_browser(self) -> Optional[str]:
+        screenshot_task = None
+        body = None
+        try:
+            self._set_status(AppStatus.STARTING)
+            before = proctree.children(os.getpid())
+            self._playwright = await async_playwright().start()
+            # The Playwright driver, Chromium runs under it (in its own session, out of our process group)
+            self._driver_processes = proctree.children(os.getpid()) - before
+            self._browser = await self._playwright.chromium.launch(
+                headless=True,
+                args=[
+                    "--no-sandbox",
+                    "--disable-dev-shm-usage",
+                    "--disable-gpu",
+                    "--window-size=1920,1080",
+                ],
+            )
+
+            self._context = await self._browser.new_context(
+                viewport={"width": 1920, "height": 1080},
+                user_agent=USER_AGENT,
+            )
+
+            self._page = await self._context.new_page()
+
+            # Start background screenshot task when the owner takes frames. The worker always
+            # does, it only stores them while someone has the live view open.
+            if self._on_frame:
+                screenshot_task = asyncio.create_task(self._screenshot_loop())
+
+            if self._running:
+                with self._stats.phase("login"):
+                    await self._process_login()
+
+            if self._running:
+                with self._stats.phase("fetch"):
+                    body = await self._process_fetch()
+                self._save_checkpoint(STAGE_FETCH, body)
+        finally:
+            await self._close_browser(screenshot_task)
+        return body
+
+    async def _teardown_step(self, name: str, awaitable) -> bool:
+        """Wait at most TEARDOWN_STEP_SECONDS for one teardown step. False if it missed the deadline."""
+        step = asyncio.ensure_future(awaitable)
+        try:
+            done, _ = await asyncio.wait({step}, timeout=TEARDOWN_STEP_SECONDS)
+        except asyncio.CancelledError:
+            # Stopped again while closing, don't wait for anything any more
+            step.cancel()
+            raise
+        if not done:
+            step.cancel()
+            logger.warning(f"Closing the {name} took more than {TEARDOWN_STEP_SECONDS}s")
+            return False
+        if not step.cancelled() and step.exception():
+            logger.debug(f"Error while closing the {name}: {step.exception()}")
+        return True
+
+    async def _close_browser(self, screenshot_task: Optional[asyncio.Task] = None):
+        # Every step has a deadline, a wedged browser is killed instead of holding up the stop.
+        # Chromium outlives a dead driver, so its processes are collected before anything is closed.
+        self._driver_processes = self._browser_processes()
+        try:
+            closed = True
+            if screenshot_task:
+                screenshot_task.cancel()
+                closed = await self._teardown_step("screenshots", screenshot_task)
+            if closed and self._context:
+                closed = await self._teardown_step("browser context", self._context.close())
+            if closed and self._browser:
+                closed = await self._teardown_step("browser", self._browser.close())
+            if not closed:
+                self.kill_browser()
+            if self._playwright:
+                await self._teardown_step("Playwright driver", self._playwright.stop())
+        finally:
+            # Whatever is left of the driver's tree, normally nothing
+            self.kill_browser()
+            self._driver_processes = set()
+            self._playwright = None
+            self._context = None
+            self._browser = None
+            self._page = None
+
+    def _browser_processes(self) -> set:
+        if not self._driver_processes:
+            return set()
+        return proctree.descendants(pid for pid, _ in self._driver_processes) | self._driver_processes
+
+    def kill_browser(self) -> int:
+        """SIGKILL the Playwright driver and every browser process started under it."""
+        killed = proctree.kill(self._browser_processes())
+        if killed:
+            logger.warning(f"Killed {killed} browser processes")
+        return killed
 
     async def _screenshot_loop(self):
+        # Fast while the page changes, slowing down while it stays still. Only changed
+        # frames are published, viewers rescale them (see live_view.py).
+        differ = frames.FrameDiffer()
+        interval = frames.FRAME_MIN_INTERVAL
+        last_sent = 0.0
         while self._running:
             if self._page and not self._page.is_closed():
                 try:
-                    self._latest_screenshot = await self._page.screenshot(type="jpeg", quality=50)
+                    screenshot = await self._page.screenshot(type="jpeg", quality=frames.SCREENSHOT_QUALITY)
+                    difference = differ.difference(screenshot)
+                    # Small changes (a countdown, a caret) still go out at the slowest rate
+                    stale = difference > 0 and time.monotonic() - last_sent >= frames.FRAME_MAX_INTERVAL
+                    if difference > differ.threshold or stale:
+                        interval = frames.FRAME_MIN_INTERVAL
+                        differ.reference(screenshot)
+                        last_sent = time.monotonic()
+                        self._latest_screenshot = screenshot
+                        if self._on_frame:
+                            self._on_frame(screenshot)
+                    else:
+                        interval = min(interval * 1.5, frames.FRAME_MAX_INTERVAL)
                 except Exception:
                     pass
-            await asyncio.sleep(0.5)
+            await asyncio.sleep(interval)
 
     async def _process_login(self):
         self._set_status(AppStatus.LOGGING_IN)
         logger.info("Navigating to dashboard...")
-        await self._page.goto("https://onlinebanking.techcombank.com.vn/dashboard")
+        await self._page.goto(f"{TCB_BASE_URL}/dashboard")
         
         await expect(self._page.locator("#username")).to_be_visible()
         await self._page.locator("#username").fill(self._config["tcb_username"])
@@ -191,6 +425,39 @@ class BankingService:
 
         self._set_status(AppStatus.LOGGING_IN)
         logger.info("Logged in successfully!")
+    def _transactions_request(self, auth_token: str) -> tuple[str, dict]:
+        return transactions_url(self._config["date_from"], self._config["date_to"]), bank_headers(auth_token)
+
+    async def _fetch_direct(self) -> Optional[str]:
+        """Fetch with the cached bank token, without a browser. None means the browser is needed."""
+        user_id = self._config.get("user_id")
+        auth_token = self._tokens.get(user_id) if self._tokens else None
+        if not auth_token:
+            return None
+
+        self._set_status(AppStatus.FETCHING_DATA)
+        logger.info("Fetching data with cached bank token...")
+        url, headers = self._transactions_request(auth_token)
+        try:
+            async with httpx.AsyncClient(timeout=30) as client:
+                response = await client.get(url, headers=headers)
+        except httpx.HTTPError as e:
+            logger.info(f"Direct fetch failed ({e}), falling back to browser login")
+            return None
+
+        if response.status_code in (401, 403):
+            logger.info("Cached bank token was rejected, falling back to browser login")
+            self._tokens.invalidate(user_id)
+            return None
+        if response.status_code != 200:
+            logger.info(f"Direct fetch returned status {response.status_code}, falling back to browser login")
+            return None
+
+        body = response.text
+        self._stats.bytes_fetched += len(response.content)
+        logger.info(f"Got {len(body)} bytes of transaction data from {self._config['date_from']} to {self._config['date_to']}")
+        return body
+
     async def _process_fetch(self):
         self._set_status(AppStatus.FETCHING_DATA)
         logger.info("Fetching data...")
@@ -201,54 +468,32 @@ class BankingService:
             auth_cookie = None
             for cookie in cookies:
                 if cookie['name'] == 'Authorization' and cookie['domain'] == 'onlinebanking.techcombank.com.vn':
-                    auth_cookie = cookie['value']
+                    auth_cookie = cookie
                     break
             
             if not auth_cookie:
                 raise Exception("Could not find Authorization cookie")
             
             logger.info("Found authorization token")
-            
-            # Calculate date range
-            
-            # Use custom dates if provided, otherwise default to last 30 days
-            if self._config.get("date_from") and self._config.get("date_to"):
-                date_from = self._config["date_from"]
-                date_to = self._config["date_to"]
-                logger.info(f"Using custom date range: {date_from} to {date_to}")
-            else:
-                today = datetime.datetime.now().strftime("%Y-%m-%d")
-                month_ago = (datetime.datetime.now() - datetime.timedelta(days=30)).strftime("%Y-%m-%d")
-                date_from = month_ago
-                date_to = today
-                logger.info(f"Using default date range (last 30 days): {date_from} to {date_to}")
+            # Cache it so the next syncs can skip the browser while it is valid
+            if self._tokens:
+                self._tokens.put(
+                    self._config.get("user_id"),
+                    auth_cookie['value'],
+                    token_expiry(auth_cookie['value'], auth_cookie.get('expires')),
+                )
             
             # Make API call to get transactions
-            url = f"https://onlinebanking.techcombank.com.vn/api/transaction-manager/client-api/v2/transactions?bookingDateGreaterThan={date_from}&bookingDateLessThan={date_to}&from=0&size=500&orderBy=bookingDate&direction=DESC"
-            
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:132.0) Gecko/20100101 Firefox/132.0",
-                "Accept": "application/json",
-                "Accept-Language": "en-US,en;q=0.7,vi;q=0.3",
-                "Referer": "https://onlinebanking.techcombank.com.vn/",
-                "Authorization": f"Bearer {auth_cookie}",
-            }
-            
+            url, headers = self._transactions_request(auth_cookie['value'])
             response = await self._page.request.get(url=url, headers=headers)
             
             if response.status != 200:
                 raise Exception(f"API returned status {response.status}")
             
             body = await response.text()
-            logger.info(f"Got {len(body)} bytes of transaction data from {date_from} to {date_to}")
-            
-            await self._process_save(body)
-
-        except Exception as e:
-            logger.error(f"Fetch flow failed: {e}")
-            self._last_error = str(e)
-            self._set_status(AppStatus.ERROR)
-            raise e
+            self._stats.bytes_fetched += len(body.encode())
+            logger.info(f"Got {len(body)} bytes of transaction data from {self._config['date_from']} to {self._config['date_to']}")
+            return body
 
         except Exception as e:
             logger.error(f"Fetch flow failed: {e}")
@@ -256,53 +501,65 @@ class BankingService:
             self._set_status(AppStatus.ERROR)
             raise e
 
-    async def _process_save(self, data_str: str):
+    async def _process_save(self, data_str: str, checkpoints: dict):
          self._set_status(AppStatus.SAVING_DATA)
-         data_json = json.loads(data_str)
-         
-         logger.info(f"Data type: {type(data_json)}")
-         transactions_list = []
-
-         logger.debug(f"Data keys: {list(data_json.keys()) if isinstance(data_json, dict) else 'N/A'}")
-         
-         if isinstance(data_json, list):
-             # Direct list of transactions (from the proper API)
-             transactions_list = data_json
-         elif isinstance(data_json, dict):
-             # Nested structure - try various paths
-             if "document" in data_json and isinstance(data_json["document"], dict):
-                 if "listTransaction" in data_json["document"]:
-                     transactions_list = data_json["document"]["listTransaction"]
-             elif "transactions" in data_json:
-                 transactions_list = data_json["transactions"]
-             elif "value" in data_json and isinstance(data_json["value"], list):
-                 transactions_list = data_json["value"]
-             elif "data" in data_json and isinstance(data_json["data"], list):
-                 transactions_list = data_json["data"]
-         
-         if not transactions_list:
-              logger.warning("Could not find a list of transactions in the response!")
-              # We might continue to extract empty, or fail. 
-              # For now, let's pass what we have if it's a list, otherwise empty.
-              if not isinstance(transactions_list, list):
-                  transactions_list = []
+         if STAGE_CONVERT in checkpoints:
+             self._skip_stage(STAGE_CONVERT)
+             converted = checkpoints[STAGE_CONVERT]
+             self._watermark = None
+         else:
+             try:
+                 with self._stats.phase("convert"):
+                     converted = self._convert(data_str)
+             except transactions.TransactionDataError:
+                 # Resuming would fail on the same body again, fetch it anew next time
+                 self._checkpoints.discard(self._run_id, STAGE_FETCH)
+                 raise
+             self._save_checkpoint(STAGE_CONVERT, converted)
+         self._stats.account_counts = {account: len(batch) for account, batch in converted.items()}
+
+         if self._config.get("export_sinks"):
+             if STAGE_EXPORT in checkpoints:
+                 self._skip_stage(STAGE_EXPORT)
+             else:
+                 with self._stats.phase("export"):
+                     await self._run_blocking(self._export, converted)
+                 self._save_checkpoint(STAGE_EXPORT, self._config["export_sinks"])
+
+         if self._config.get("dry_run"):
+             logger.info("Dry run, not importing to Actual")
+         else:
+             with self._stats.phase("import"):
+                 await self._import_to_actual(converted, checkpoints)
+         self._set_status(AppStatus.SUCCESS)
+
+    def _convert(self, data_str: str) -> dict:
+         # Decoded straight into typed structs, unused fields are never materialized
+         transactions_list = transactions.decode_bank_body(data_str)
+         # Newest first, the scheduler compares it to skip runs when nothing changed
+         self._watermark = transactions_list[0].id if transactions_list else None
 
          logger.info(f"Converting {len(transactions_list)} transactions...")
-         
-         # Make sure convert module uses the mapping passed in config
-         # We need to temporarily patch or pass mapping to convert function
-         # For now, let's assume convert module is modified or we do it here.
-         # Actually, better to modify convert module to accept mapping.
-         # But for speed, let's modify convert module in a separate step or monkeypatch for now?
-         # No, cleaner to pass mapping.
-         
-         # Assuming convert_module.convert_to_actual_import accepts (data, mapping)
-         # If not, let's update it in next step. For now, calling with expected signature correction.
-         converted = convert.convert_to_actual_import(transactions_list, self._config.get("accounts_mapping", {}))
-         
-         logger.info("Fetching Actual's token...")
-         loop = asyncio.get_event_loop()
-         
+         compiled_rules = rules.compile_rules(self._config.get("rules"))
+         converted = convert.convert_to_actual_import(transactions_list, self._config.get("accounts_mapping", {}), compiled_rules)
+         return converted
+
+    def _export(self, converted: dict):
+         user_id = self._config.get("user_id")
+         # Runs without a user come from the CLI
+         owner = f"user-{user_id}" if user_id is not None else "cli"
+         basename = f"{owner}/{self._config['date_from']}_{self._config['date_to']}_{self._run_id}"
+         opened = sinks.open_sinks(self._config["export_sinks"], basename)
+         try:
+             for account, batch in converted.items():
+                 for sink in opened:
+                     sink.write_batch(batch)
+         finally:
+             for sink in opened:
+                 sink.close()
+                 logger.info(f"Exported transactions to {sink.path}")
+
+    async def _import_to_actual(self, converted: dict, checkpoints: dict):
          # Custom init_actual that uses our config
          actual_config = {
              "url": self._config["actual_url"],
@@ -310,16 +567,40 @@ class BankingService:
              "budget_id": self._config["actual_budget_id"],
              "budget_password": self._config.get("actual_budget_password")
          }
-         
-         actual_token = await loop.run_in_executor(None, lambda: actual.init_actual(actual_config))
-         
-         if not actual_token:
-             raise Exception("Failed to get Actual Budget token")
+
+         async def fetch_token():
+             logger.info("Fetching Actual's token...")
+             token = await self._run_blocking(actual.init_actual, actual_config)
+             if not token:
+                 raise Exception("Failed to get Actual Budget token")
+             self._save_checkpoint(STAGE_ACTUAL_TOKEN, token)
+             return token
+
+         actual_token = checkpoints.get(STAGE_ACTUAL_TOKEN) or ""
+         token_from_checkpoint = bool(actual_token)
+         if token_from_checkpoint:
+             self._skip_stage(STAGE_ACTUAL_TOKEN)
+         else:
+             actual_token = await fetch_token()
 
          logger.info("Importing data to Actual...")
-         for account, transactions in converted.items():
-            await loop.run_in_executor(None, lambda: actual.import_transactions(actual_token, account, transactions, actual_config["url"]))
-         
-         self._set_status(AppStatus.SUCCESS)
+         for account, batch in converted.items():
+            stage = f"{STAGE_IMPORT_PREFIX}{account}"
+            if stage in checkpoints:
+                self._skip_stage(stage)
+                self._stats.skipped += len(batch)
+                continue
+
+            result = await self._run_blocking(actual.import_transactions, actual_token, account, batch, actual_config["url"])
+            if result is None and token_from_checkpoint:
+                # The saved token may have expired in the meantime, get a fresh one and retry once
+                logger.info("Import failed with saved Actual token, fetching a new one")
+                self._checkpoints.discard(self._run_id, STAGE_ACTUAL_TOKEN)
+                actual_token = await fetch_token()
+                token_from_checkpoint = False
+                result = await self._run_blocking(actual.import_transactions, actual_token, account, batch, actual_config["url"])
+            if result is None:
+                raise Exception(f"Failed to import transactions for account {account}")
+            self._stats.count_import(len(batch), result)
+            self._save_checkpoint(stage, result)
 
-banking_service = BankingService()
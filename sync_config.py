@@ -0,0 +1,52 @@
+import json
+from typing import Optional
+
+from sqlmodel import Session, select
+
+from auth import decrypt_value
+from database import engine
+from models import Settings
+from modules.convert import parse_accounts_mapping
+
+
+def build_sync_config(settings_db: Settings, date_from: Optional[str] = None, date_to: Optional[str] = None) -> dict:
+    """Sync config for a user's settings, with credentials decrypted."""
+    return {
+        "user_id": settings_db.user_id,
+        "tcb_username": settings_db.tcb_username,
+        "tcb_password": decrypt_value(settings_db.tcb_password_enc),
+        "actual_url": settings_db.actual_url,
+        "actual_password": decrypt_value(settings_db.actual_password_enc),
+        "actual_budget_id": settings_db.actual_budget_id,
+        "actual_budget_password": decrypt_value(settings_db.actual_budget_password_enc) if settings_db.actual_budget_password_enc else None,
+        "accounts_mapping": parse_accounts_mapping(settings_db.accounts_mapping),
+        "export_sinks": json.loads(settings_db.export_sinks or "[]"),
+        "rules": json.loads(settings_db.rules or "[]"),
+        "date_from": date_from,
+        "date_to": date_to,
+        "profile": bool(settings_db.profile_next_run),
+    }
+
+
+def record_watermark(user_id: Optional[int], watermark: str):
+    """Remember the newest transaction id a successful sync saw, see scheduler.py."""
+    if user_id is None:
+        return
+    with Session(engine) as session:
+        settings_db = session.exec(select(Settings).where(Settings.user_id == user_id)).first()
+        if settings_db:
+            settings_db.sync_watermark = watermark
+            session.add(settings_db)
+            session.commit()
+
+
+def set_profile_next_run(user_id: int, enabled: bool) -> bool:
+    """Arm or disarm profiling of the user's next sync. False when the user has no settings yet."""
+    with Session(engine) as session:
+        settings_db = session.exec(select(Settings).where(Settings.user_id == user_id)).first()
+        if not settings_db:
+            return False
+        settings_db.profile_next_run = enabled
+        session.add(settings_db)
+        session.commit()
+        return True
@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import multiprocessing as mp
+import os
+import queue
+import signal
+import struct
+from multiprocessing import shared_memory
+from typing import Callable, Optional
+
+from modules import proctree
+from modules.logger import logger
+
+# Two frame slots so the parent can copy one while the child writes the next
+FRAME_SLOT_SIZE = int(os.getenv("SYNC_FRAME_SLOT_BYTES", str(2 * 1024 * 1024)))
+# Sequence number and size of the frame in the slot, the sequence is 0 while it is being written
+FRAME_HEADER = struct.Struct("<QI")
+STOP_GRACE_SECONDS = float(os.getenv("SYNC_STOP_GRACE_SECONDS", "10"))
+# How often the processes under a running sync are listed, see SyncProcess.kill
+TREE_SCAN_INTERVAL = 1.0
+
+_mp = mp.get_context("spawn")
+
+
+class _QueueLogHandler(logging.Handler):
+    def __init__(self, events):
+        super().__init__()
+        self.events = events
+        self.setFormatter(logging.Formatter('%(asctime)s - %(message)s', datefmt='%H:%M:%S'))
+
+    def emit(self, record):
+        try:
+            self.events.put_nowait(("log", self.format(record)))
+        except Exception:
+            pass
+
+
+def _child_main(config: dict, resume: bool, events, stop_event, shm_name: str):
+    # Own process group, so a hard kill also takes down the Playwright driver.
+    # Chromium starts its own session and is killed through the process tree, see SyncProcess.kill.
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()
+
+    from service import BankingService
+    from checkpoint import checkpoint_store
+    from token_vault import token_vault
+    from sync_config import record_watermark
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    seq = 0
+
+    def on_frame(frame: bytes):
+        nonlocal seq
+        if len(frame) + FRAME_HEADER.size > FRAME_SLOT_SIZE:
+            return
+        seq += 1
+        offset = (seq % 2) * FRAME_SLOT_SIZE
+        FRAME_HEADER.pack_into(shm.buf, offset, 0, 0)
+        shm.buf[offset + FRAME_HEADER.size:offset + FRAME_HEADER.size + len(frame)] = frame
+        FRAME_HEADER.pack_into(shm.buf, offset, seq, len(frame))
+        events.put_nowait(("frame", seq))
+
+    logger.addHandler(_QueueLogHandler(events))
+    service = BankingService(
+        on_change=lambda snapshot: events.put_nowait(("status", snapshot)),
+        on_frame=on_frame,
+        checkpoints=checkpoint_store,
+        tokens=token_vault,
+        on_watermark=record_watermark,
+    )
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        # SIGTERM (a parent going down, `docker stop`) stops the sync like the stop button,
+        # so the browser is closed instead of orphaned
+        if hasattr(signal, "SIGTERM"):
+            loop.add_signal_handler(signal.SIGTERM, stop_event.set)
+        await service.start_sync(config, resume=resume)
+        sync_done = asyncio.create_task(service.wait())
+        stop_requested = loop.run_in_executor(None, stop_event.wait)
+        await asyncio.wait([sync_done, stop_requested], return_when=asyncio.FIRST_COMPLETED)
+        if not sync_done.done():
+            await service.stop_sync()
+        else:
+            # Unblock the executor thread waiting on the stop event
+            stop_event.set()
+
+    try:
+        asyncio.run(main())
+        events.put(("stats", service.run_stats()))
+        profile = service.profile_data()
+        if profile:
+            events.put(("profile", profile))
+        events.put(("done", service.snapshot()))
+    finally:
+        shm.close()
+
+
+class SyncProcess:
+    """A single sync run executed in a child process.
+
+    Status, log lines and frames come back as events; frames travel through
+    shared memory so only a slot index goes over the queue.
+    """
+
+    def __init__(self, config: dict, resume: bool = True):
+        self.config = config
+        self.resume = resume
+        self.final_snapshot: Optional[dict] = None
+        self.stats: Optional[dict] = None
+        self.profile: Optional[dict] = None
+        self._events = _mp.Queue()
+        self._stop_event = _mp.Event()
+        self._shm = shared_memory.SharedMemory(create=True, size=FRAME_SLOT_SIZE * 2)
+        self._process = _mp.Process(
+            target=_child_main,
+            args=(config, resume, self._events, self._stop_event, self._shm.name),
+            daemon=True,
+        )
+        # The child and everything under it, refreshed while it runs. Chromium starts its own
+        # session, so killing the child's process group does not reach it.
+        self._tree: set = set()
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._process.pid
+
+    @property
+    def crashed(self) -> bool:
+        # Exited without reporting a final status
+        return not self._process.is_alive() and self.final_snapshot is None
+
+    def start(self):
+        self._process.start()
+
+    def _read_frame(self, seq: int) -> Optional[bytes]:
+        """The frame with this sequence number, None if the child has already reused its slot."""
+        offset = (seq % 2) * FRAME_SLOT_SIZE
+        written, size = FRAME_HEADER.unpack_from(self._shm.buf, offset)
+        if written != seq:
+            return None
+        frame = bytes(self._shm.buf[offset + FRAME_HEADER.size:offset + FRAME_HEADER.size + size])
+        # Overwritten while copying (the parent fell two frames behind), drop it
+        if FRAME_HEADER.unpack_from(self._shm.buf, offset)[0] != seq:
+            return None
+        return frame
+
+    async def pump(
+        self,
+        on_status: Callable[[dict], None],
+        on_log: Callable[[str], None],
+        on_frame: Callable[[bytes], None],
+    ):
+        """Relay events to the callbacks until the child exits."""
+        loop = asyncio.get_running_loop()
+        next_scan = 0.0
+        while True:
+            if loop.time() >= next_scan:
+                # Browsers come and go during a run, remember every process seen.
+                # Reading /proc takes a few ms, not on the event loop (the API's in embedded mode).
+                next_scan = loop.time() + TREE_SCAN_INTERVAL
+                self._tree |= await loop.run_in_executor(None, proctree.descendants, [self._process.pid])
+            try:
+                kind, payload = self._events.get_nowait()
+            except queue.Empty:
+                if not self._process.is_alive():
+                    break
+                await asyncio.sleep(0.05)
+                continue
+
+            if kind == "status":
+                on_status(payload)
+            elif kind == "log":
+                on_log(payload)
+            elif kind == "frame":
+                frame = self._read_frame(payload)
+                if frame is not None:
+                    on_frame(frame)
+            elif kind == "stats":
+                self.stats = payload
+            elif kind == "profile":
+                self.profile = payload
+            elif kind == "done":
+                self.final_snapshot = payload
+        self._process.join(timeout=1)
+
+    async def stop(self, grace: float = STOP_GRACE_SECONDS):
+        """Ask the child to stop, and kill it if it has not exited after `grace` seconds."""
+        self._stop_event.set()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._process.join, grace)
+        if self._process.is_alive():
+            logger.warning(f"Sync process {self.pid} did not stop within {grace}s, killing it")
+            # Walks /proc for the browser processes, not on the event loop
+            await loop.run_in_executor(None, self.kill)
+
+    def kill(self):
+        if self._process.pid is None:
+            return
+        # Collect the tree first, killing the child reparents what's under it
+        self._tree |= proctree.descendants([self._process.pid])
+        try:
+            if hasattr(os, "killpg"):
+                os.killpg(self._process.pid, signal.SIGKILL)
+            else:
+                self._process.kill()
+        except ProcessLookupError:
+            pass
+        proctree.kill(self._tree)
+
+    def close(self):
+        if self._process.is_alive():
+            self.kill()
+        self._process.join(timeout=1)
+        # A child that died or was killed without closing its browser leaves Chromium behind
+        leaked = proctree.kill(self._tree)
+        if leaked:
+            logger.warning(f"Killed {leaked} leftover browser processes of sync process {self.pid}")
+        self._shm.close()
+        self._shm.unlink()
@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# database.py creates data/database.db in the working directory on import, keep it out of the repo
+os.chdir(tempfile.mkdtemp(prefix="tcb-actual-tests-"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from auth import encrypt_value, get_current_user
+from database import create_db_and_tables, engine
+from models import Settings, User
+from routers import statements
+
+STATEMENT = (
+    "Techcombank account statement\r\n"
+    "\r\n"
+    "Transaction Date,Reference,Description,Debit,Credit\r\n"
+    "01/03/2025,FT1,Coffee,\"45,000\",\r\n"
+    "01/03/2025,FT2,\"Salary\r\nMarch\",,\"20,000,000\"\r\n"
+    "02/03/2025,FT3,Coffee,\"45,000\",\r\n"
+    "Total,,,\"90,000\",\"20,000,000\"\r\n"
+)
+
+
+@pytest.fixture(scope="module")
+def client():
+    create_db_and_tables()
+    with Session(engine) as session:
+        user = User(username="statements", password_hash="-")
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+        session.add(Settings(
+            user_id=user.id,
+            tcb_username="tcb",
+            tcb_password_enc=encrypt_value("tcb"),
+            actual_url="http://actual.invalid",
+            actual_password_enc=encrypt_value("actual"),
+            actual_budget_id="budget",
+            accounts_mapping=json.dumps({"ARR-1": "actual-account-1"}),
+        ))
+        session.commit()
+        session.refresh(user)
+
+    app = FastAPI()
+    app.include_router(statements.router)
+    app.dependency_overrides[get_current_user] = lambda: user
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("encoding", ["utf-8-sig", "utf-16"])
+def test_import_csv_upload(client, encoding):
+    response = client.post(
+        "/api/statements/import",
+        files={"file": ("statement.csv", STATEMENT.encode(encoding), "text/csv")},
+        data={"account": "actual-account-1", "dry_run": "true"},
+    )
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["dry_run"] is True
+    assert body["transactions"] == 3
+    assert body["account_counts"] == {"actual-account-1": 3}
+
+
+def test_import_unknown_account(client):
+    response = client.post(
+        "/api/statements/import",
+        files={"file": ("statement.csv", STATEMENT.encode(), "text/csv")},
+        data={"account": "nope", "dry_run": "true"},
+    )
+    assert response.status_code == 400
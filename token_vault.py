@@ -0,0 +1,53 @@
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlmodel import Session, select
+
+from database import engine
+from models import BankToken, utcnow
+from auth import encrypt_value, decrypt_value
+
+# Tokens this close to expiry are treated as expired, a sync must not run out mid-fetch
+BANK_TOKEN_EXPIRY_MARGIN = int(os.getenv("BANK_TOKEN_EXPIRY_MARGIN", "30")) # seconds
+
+
+def _aware(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class TokenVault:
+    """Per-user bank API tokens, encrypted with the app's Fernet key."""
+
+    def get(self, user_id: Optional[int]) -> Optional[str]:
+        if user_id is None:
+            return None
+        with Session(engine) as session:
+            row = session.exec(select(BankToken).where(BankToken.user_id == user_id)).first()
+            if not row:
+                return None
+            if _aware(row.expires_at) - timedelta(seconds=BANK_TOKEN_EXPIRY_MARGIN) <= utcnow():
+                return None
+            return decrypt_value(row.token_enc) or None
+
+    def put(self, user_id: Optional[int], token: str, expires_at: datetime):
+        if user_id is None:
+            return
+        with Session(engine) as session:
+            row = session.exec(select(BankToken).where(BankToken.user_id == user_id)).first()
+            if not row:
+                row = BankToken(user_id=user_id, token_enc="", expires_at=expires_at)
+            row.token_enc = encrypt_value(token)
+            row.expires_at = expires_at
+            row.updated_at = utcnow()
+            session.add(row)
+            session.commit()
+
+    def invalidate(self, user_id: Optional[int]):
+        with Session(engine) as session:
+            row = session.exec(select(BankToken).where(BankToken.user_id == user_id)).first()
+            if row:
+                session.delete(row)
+                session.commit()
+
+
+token_vault = TokenVault()
@@ -0,0 +1,261 @@
+import asyncio
+import os
+import signal
+import socket
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from database import create_db_and_tables
+from jobstore import JobStore, get_job_store
+from models import utcnow
+from runs import run_store
+from sync_config import set_profile_next_run
+from service import AppStatus
+from sync_process import SyncProcess
+from modules.logger import logger
+
+LEASE_SECONDS = float(os.getenv("SYNC_LEASE_SECONDS", "30"))
+POLL_INTERVAL = float(os.getenv("SYNC_POLL_INTERVAL", "1.0"))
+# How many times a crashed sync process is restarted, checkpoints make the restart resume
+MAX_RESTARTS = int(os.getenv("SYNC_MAX_RESTARTS", "2"))
+# On shutdown a running sync gets this long to finish on its own before it is stopped
+# (which takes at most SYNC_STOP_GRACE_SECONDS more)
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SYNC_SHUTDOWN_DRAIN_SECONDS", "0"))
+
+
+class SyncWorker:
+    """Claims sync jobs from the shared store and runs each one in a supervised child process.
+
+    The browser, JSON parsing and conversion never share an event loop or GIL with the API.
+    """
+
+    def __init__(self, store: Optional[JobStore] = None, worker_id: Optional[str] = None):
+        self.store = store or get_job_store()
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._job_id: Optional[int] = None
+        self._process: Optional[SyncProcess] = None
+        self._stop_requested = False
+        self._stopping = False
+        self._aborted = False # Stopped by shutdown, not by the user
+        self._idle = asyncio.Event()
+        self._idle.set()
+        # Job store writes run here, off the event loop (the API's loop in embedded mode).
+        # One thread keeps them in order, so finish() always lands after the last update.
+        self._writes = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store")
+        self._pending_logs = deque()
+        self._logs_flush_queued = False
+        # Frames are only written to the job store while someone has the live view open
+        self._watched = False
+        self._last_frame: Optional[bytes] = None
+
+    def _submit_write(self, fn, *args, **kwargs):
+        def log_error(future):
+            if future.exception():
+                logger.error(f"Job store write failed: {future.exception()}")
+        self._writes.submit(fn, *args, **kwargs).add_done_callback(log_error)
+
+    def _publish_status(self, snapshot: dict):
+        if self._job_id is not None:
+            self._submit_write(self.store.update, self._job_id, self.worker_id, **snapshot)
+
+    def _publish_log(self, message: str):
+        if self._job_id is None:
+            return
+        # Lines arrive in bursts, they are written together with one commit
+        self._pending_logs.append(message)
+        if not self._logs_flush_queued:
+            self._logs_flush_queued = True
+            self._submit_write(self._flush_logs, self._job_id)
+
+    def _flush_logs(self, job_id: int):
+        # Cleared first: a line added while draining queues another flush
+        self._logs_flush_queued = False
+        messages = []
+        while self._pending_logs:
+            messages.append(self._pending_logs.popleft())
+        if messages:
+            self.store.append_logs(job_id, messages)
+
+    def _publish_frame(self, frame: bytes):
+        self._last_frame = frame
+        if self._job_id is not None and self._watched:
+            self._submit_write(self.store.put_frame, self._job_id, frame)
+
+    async def run_forever(self):
+        logger.info(f"Sync worker {self.worker_id} started")
+        while not self._stopping:
+            job = await asyncio.get_running_loop().run_in_executor(None, self.store.claim, self.worker_id, LEASE_SECONDS)
+            if not job:
+                await asyncio.sleep(POLL_INTERVAL)
+                continue
+            if self._stopping:
+                # Claimed while shutting down, another worker takes it over once the lease expires
+                logger.info(f"Shutting down, leaving sync job {job['id']} to another worker")
+                break
+            self._idle.clear()
+            try:
+                await self._run_job(job)
+            finally:
+                self._idle.set()
+
+    async def _run_job(self, job: dict):
+        self._job_id = job["id"]
+        self._stop_requested = False
+        self._watched = False
+        self._last_frame = None
+        logger.info(f"Worker {self.worker_id} claimed sync job {job['id']}")
+        heartbeat = asyncio.create_task(self._heartbeat(job["id"]))
+        snapshot = {"status": AppStatus.IDLE.value}
+        resume = job["resume"]
+        started_at = utcnow()
+        attempts = 0
+        stats = None
+        profile = None
+        error_class = None
+        try:
+            for attempt in range(MAX_RESTARTS + 1):
+                attempts = attempt + 1
+                self._process = SyncProcess(job["config"], resume=resume)
+                try:
+                    self._process.start()
+                    await self._process.pump(self._publish_status, self._publish_log, self._publish_frame)
+                finally:
+                    # Reaps the child and scans /proc for leftover browsers, blocking
+                    await asyncio.get_running_loop().run_in_executor(None, self._process.close)
+                stats = self._process.stats or stats
+                profile = self._process.profile or profile
+
+                if self._process.final_snapshot is not None:
+                    snapshot = self._process.final_snapshot
+                    break
+                if self._stop_requested:
+                    break
+                # Crashed, restart it and let the checkpoints skip the finished stages
+                resume = True
+                snapshot = {"status": AppStatus.ERROR.value, "last_error": "Sync process crashed"}
+                error_class = "SyncProcessCrashed"
+                self._publish_log(f"Sync process crashed (attempt {attempt + 1}/{MAX_RESTARTS + 1})")
+        except Exception as e:
+            logger.error(f"Sync job {job['id']} failed: {e}")
+            snapshot = {"status": AppStatus.ERROR.value, "last_error": str(e)}
+            error_class = type(e).__name__
+        finally:
+            heartbeat.cancel()
+            try:
+                await heartbeat
+            except asyncio.CancelledError:
+                pass
+            if self._aborted and snapshot.get("status") != AppStatus.SUCCESS.value:
+                # Checkpoints are kept, starting the sync again resumes it
+                snapshot["status"] = AppStatus.ERROR.value
+                snapshot["last_error"] = "Interrupted by a server shutdown, start the sync again to resume it"
+                error_class = "Shutdown"
+            elif self._stop_requested and snapshot.get("status") not in (AppStatus.SUCCESS.value, AppStatus.ERROR.value):
+                snapshot["status"] = AppStatus.IDLE.value
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                self._writes, lambda: self.store.finish(job["id"], self.worker_id, **snapshot)
+            )
+            if snapshot["status"] != AppStatus.ERROR.value:
+                error_class = None
+            await loop.run_in_executor(
+                self._writes,
+                lambda: self._record_run(job, snapshot, started_at, attempts, stats, error_class, profile),
+            )
+            self._process = None
+            self._job_id = None
+
+    def _record_run(self, job: dict, snapshot: dict, started_at, attempts: int, stats, error_class, profile):
+        try:
+            sync_run_id = run_store.record(
+                job["user_id"], job["id"], snapshot.get("run_id") or job.get("run_id"), snapshot["status"],
+                started_at, attempts=attempts, stats=stats, error_class=error_class,
+            )
+            if profile:
+                run_store.save_profile(sync_run_id, profile)
+                set_profile_next_run(job["user_id"], False)
+                logger.info(f"Stored profile of sync run {sync_run_id}")
+        except Exception as e:
+            logger.error(f"Failed to record sync run history: {e}")
+
+    async def _stop_process(self):
+        self._stop_requested = True
+        if self._process:
+            await self._process.stop()
+
+    async def _heartbeat(self, job_id: int):
+        # Keep the lease alive and watch for stop requests and live view viewers coming from any API process
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(min(1.0, LEASE_SECONDS / 3))
+            renewed = await loop.run_in_executor(None, self.store.renew, job_id, self.worker_id, LEASE_SECONDS)
+            if not renewed:
+                logger.warning(f"Lost lease on sync job {job_id}, stopping")
+                await self._stop_process()
+                return
+            if await loop.run_in_executor(None, self.store.is_cancel_requested, job_id):
+                logger.info(f"Stop requested for sync job {job_id}")
+                await self._stop_process()
+                return
+            watched = await loop.run_in_executor(None, self.store.is_watched, job_id)
+            if watched and not self._watched and self._last_frame is not None:
+                # A viewer just arrived, show them the current page without waiting for it to change
+                self._submit_write(self.store.put_frame, job_id, self._last_frame)
+            self._watched = watched
+
+    async def shutdown(self, drain: float = SHUTDOWN_DRAIN_SECONDS) -> float:
+        """Stop claiming jobs and bring the running one (if any) to an end. Returns the seconds it took.
+
+        The sync gets `drain` seconds to finish, then it is stopped like with the stop button,
+        its browser killed after SYNC_STOP_GRACE_SECONDS at the latest.
+        """
+        started = time.monotonic()
+        self._stopping = True
+        if self._job_id is None:
+            return 0.0
+        job_id = self._job_id
+        if drain > 0:
+            logger.info(f"Waiting up to {drain}s for sync job {job_id} to finish")
+            try:
+                await asyncio.wait_for(self._idle.wait(), drain)
+            except asyncio.TimeoutError:
+                pass
+        if not self._idle.is_set():
+            logger.info(f"Stopping sync job {job_id} for shutdown")
+            self._aborted = True
+            await self._stop_process()
+            # Then the job is finished and recorded, a few database writes
+            try:
+                await asyncio.wait_for(self._idle.wait(), 5)
+            except asyncio.TimeoutError:
+                logger.warning(f"Sync job {job_id} was not finished in time, its lease will expire")
+        elapsed = time.monotonic() - started
+        logger.info(f"Worker {self.worker_id} idle after {elapsed:.2f}s")
+        return elapsed
+
+
+async def _main():
+    worker = SyncWorker()
+    loop = asyncio.get_running_loop()
+    task = asyncio.create_task(worker.run_forever())
+    # SIGTERM (docker stop, supervisor) and Ctrl-C shut the worker down cleanly, bounded in time
+    shutdown = asyncio.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, shutdown.set)
+    await asyncio.wait([task, asyncio.create_task(shutdown.wait())], return_when=asyncio.FIRST_COMPLETED)
+    await worker.shutdown()
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+if __name__ == "__main__":
+    if not os.getenv("SECRET_KEY"):
+        logger.warning("SECRET_KEY is not set, the worker cannot decrypt jobs queued by the API process")
+    create_db_and_tables()
+    asyncio.run(_main())